@@ -0,0 +1,166 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+
+import models
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alert_rules.json")
+
+
+class AlertRule:
+    """出奖提醒规则：记录的 field（multiple 或 value）达到 threshold 时触发"""
+
+    def __init__(self, name, field, threshold, gift_type="*", priority=0, cooldown=30.0, template=None):
+        self.name = name
+        self.field = field
+        self.threshold = threshold
+        self.gift_type = gift_type
+        self.priority = priority
+        self.cooldown = cooldown  # 同一规则对同一用户的冷却时间（秒）
+        self.template = template or "恭喜 {user} 抽中 {gift} {multiple} 倍，获得 {value:,} 豆！"
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data["field"], data["min"], data.get("gift_type", "*"),
+                   data.get("priority", 0), data.get("cooldown", 30.0), data.get("template"))
+
+    def value_of(self, record):
+        if self.field == "value":
+            return models.record_value(record)
+        return getattr(record, self.field, None)
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    """从规则文件加载提醒规则；文件不存在或损坏时返回空列表，格式错误的规则被跳过"""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, encoding='utf8') as f:
+            items = json.load(f)
+        if not isinstance(items, list):
+            raise ValueError("规则文件应为规则列表")
+    except (OSError, ValueError) as e:
+        print(f"出奖提醒规则加载失败，不启用提醒: {e}")
+        return []
+    rules = []
+    for index, item in enumerate(items):
+        try:
+            rules.append(AlertRule.from_dict(item))
+        except (KeyError, TypeError, AttributeError) as e:
+            print(f"出奖提醒规则 #{index + 1} 格式错误，已跳过: {e!r}")
+    return rules
+
+
+class AlertEngine:
+    """逐条评估入库记录，规则按礼物分类预先编译为分派表"""
+
+    def __init__(self, rules, max_age=120.0):
+        self.max_age = max_age  # 只对最近发生的记录提醒，避免首次同步时补发历史记录
+        self._lock = threading.Lock()
+        self._last_fired = {}  # (规则名, 用户) -> 上次触发时间
+        self._fired_records = {}  # 已提醒的记录 -> 触发时间
+        self.set_rules(rules)
+
+    def set_rules(self, rules):
+        """编译规则：礼物分类 -> 规则元组，未知分类只匹配通配规则"""
+        wildcard = tuple(rule for rule in rules if rule.gift_type == "*")
+        table = {}
+        for rule in rules:
+            if rule.gift_type != "*":
+                table.setdefault(rule.gift_type, list(wildcard)).append(rule)
+        self._wildcard = wildcard
+        self._dispatch = {gift_type: tuple(items) for gift_type, items in table.items()}
+
+    def evaluate(self, record, timestamp, now=None):
+        """返回本条记录触发的 [(规则, 文本), ...]"""
+        rules = self._dispatch.get(record.gift_type, self._wildcard)
+        if not rules or timestamp is None:
+            return []
+        now = time.time() if now is None else now
+        if now - timestamp > self.max_age:
+            return []
+
+        alerts = []
+        record_id = (type(record).__name__, record.time, record.user, record.gift)
+        with self._lock:
+            for rule in rules:
+                value = rule.value_of(record)
+                if value is None or value < rule.threshold:
+                    continue
+                fired_key = (rule.name,) + record_id
+                cooldown_key = (rule.name, record.user)
+                if fired_key in self._fired_records:
+                    continue
+                if now - self._last_fired.get(cooldown_key, float('-inf')) < rule.cooldown:
+                    continue
+                self._fired_records[fired_key] = now
+                self._last_fired[cooldown_key] = now
+                alerts.append((rule, rule.template.format(
+                    time=record.time, user=record.user, gift=record.gift, gift_type=record.gift_type,
+                    multiple=getattr(record, 'multiple', ""), value=models.record_value(record))))
+            self._prune(now)
+        return alerts
+
+    def _prune(self, now):
+        cutoff = now - self.max_age * 2
+        if len(self._fired_records) > 1000:
+            self._fired_records = {k: t for k, t in self._fired_records.items() if t >= cutoff}
+
+
+class AlertQueue:
+    """按优先级把提醒推送到vMix；提醒显示期间滚动字幕暂停更新"""
+
+    def __init__(self, show, restore, hold=8.0, ttl=30.0, max_size=10):
+        self._show = show  # show(text)：显示提醒
+        self._restore = restore  # restore()：队列清空后恢复滚动字幕
+        self.hold = hold  # 每条提醒的显示时间（秒）
+        self.ttl = ttl  # 排队超过该时间（秒）的提醒不再显示
+        self.max_size = max_size  # 队列满时丢弃优先级最低的提醒（同优先级时丢弃最晚入队的）
+        self._heap = []
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self.active = False
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def push(self, priority, text):
+        with self._condition:
+            heapq.heappush(self._heap, (-priority, next(self._seq), time.time(), text))
+            if len(self._heap) > self.max_size:
+                # 堆中最大的元素即优先级最低、同优先级中最晚入队的一条
+                self._heap.remove(max(self._heap))
+                heapq.heapify(self._heap)
+            self.active = True
+            self._condition.notify()
+
+    def _pop_fresh(self):
+        """取出优先级最高且未过期的提醒，没有时返回 None（须持有 _condition）"""
+        cutoff = time.time() - self.ttl
+        while self._heap:
+            _, _, enqueued, text = heapq.heappop(self._heap)
+            if enqueued >= cutoff:
+                return text
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                text = self._pop_fresh()
+            if text is not None:
+                try:
+                    self._show(text)
+                except Exception as e:
+                    print(f"出奖提醒推送失败: {e}")
+                time.sleep(self.hold)
+            with self._condition:
+                if self._heap:
+                    continue
+                self.active = False
+            try:
+                self._restore()
+            except Exception as e:
+                print(f"恢复滚动字幕失败: {e}")
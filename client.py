@@ -0,0 +1,34 @@
+from autobahn.asyncio.websocket import WebSocketClientProtocol
+from txaio import make_logger
+
+
+class MyClientProtocol(WebSocketClientProtocol):
+    def __init__(self):
+        WebSocketClientProtocol.__init__(self)
+        self.lucky_gift_timer = None
+        self.log = make_logger()
+        self.app = None  # 将在工厂中设置
+
+    def onConnect(self, response):
+        if self.app:
+            self.app.safe_ui_update(self.app.update_status, f"正在连接: {response.peer}")
+
+    def onOpen(self):
+        if self.app:
+            self.app.protocol = self  # 保存协议引用
+            self.app.safe_ui_update(self.app.connection_success)
+
+    def onMessage(self, payload, isBinary):
+        if not self.app:
+            return
+
+        if isBinary:
+            self.app.thread_pool.submit(self.app.process_binary_message, payload)
+        else:
+            # 将消息处理交给线程池
+            self.app.thread_pool.submit(self.app.process_message, payload)
+
+    def onClose(self, wasClean, code, reason):
+        if self.app:
+            self.app.safe_ui_update(self.app.update_status, f"连接关闭: {reason} (code: {code})")
+            self.app.safe_ui_update(self.app.reset_connection)
@@ -0,0 +1,225 @@
+import argparse
+import csv
+import json
+import os
+import struct
+import sys
+from array import array
+
+import models
+
+# 导出列：(列名, 类型)，类型为 str / int / float
+COLUMNS = (
+    ("time", str),
+    ("timestamp", float),
+    ("record_type", str),
+    ("gift_type", str),
+    ("user", str),
+    ("gift", str),
+    ("beans", int),
+    ("count", int),
+    ("multiple", float),
+    ("total", int),
+    ("receiver", str),
+)
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+RECORD_TYPES = {
+    models.GiftRecord: "gift",
+    models.LotteryRecord: "lottery",
+    models.EggRecord: "egg",
+}
+
+
+def record_to_row(record):
+    """把解析结果转换为带类型的导出行"""
+    if isinstance(record, models.EggRecord):
+        count, multiple = int(record.count), 1.0
+    elif isinstance(record, models.LotteryRecord):
+        count, multiple = 0, float(record.multiple)
+    else:
+        count, multiple = int(record.count), float(record.multiple)
+    timestamp = models.parse_record_time(record.time)
+    return (
+        record.time,
+        timestamp if timestamp is not None else 0.0,
+        RECORD_TYPES.get(type(record), ""),
+        str(record.gift_type),
+        record.user,
+        record.gift,
+        int(record.beans),
+        count,
+        multiple,
+        models.record_value(record),
+        getattr(record, 'receiver', ""),
+    )
+
+
+class CsvWriter:
+    def __init__(self, stream):
+        self._writer = csv.writer(stream)
+        self._writer.writerow(COLUMN_NAMES)
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class JsonlWriter:
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write_rows(self, rows):
+        self._stream.write("".join(json.dumps(dict(zip(COLUMN_NAMES, row)), ensure_ascii=False) + "\n"
+                                   for row in rows))
+
+    def close(self):
+        pass
+
+
+class ColumnarWriter:
+    """按行组写入的列式二进制格式（.bhrc）
+
+    文件结构：
+        MAGIC, u32 表头长度, 表头JSON（列名和类型）
+        行组*: u32 行数, 每列依次: u32 字节数 + 列数据
+        u32 0（结束标记）
+    数值列为小端 int64/float64 数组；字符串列为 u32 长度数组 + UTF-8 拼接内容。
+    """
+
+    MAGIC = b"BHRC1\n"
+    TYPE_CODES = {int: ('q', "int64"), float: ('d', "float64"), str: (None, "utf8")}
+
+    def __init__(self, stream):
+        self._stream = stream
+        header = json.dumps([[name, self.TYPE_CODES[kind][1]] for name, kind in COLUMNS]).encode('utf8')
+        stream.write(self.MAGIC + struct.pack("<I", len(header)) + header)
+
+    @staticmethod
+    def _encode_column(values, kind):
+        if kind is str:
+            encoded = [v.encode('utf8') for v in values]
+            lengths = array('I', map(len, encoded))
+            if sys.byteorder == 'big':
+                lengths.byteswap()
+            return lengths.tobytes() + b"".join(encoded)
+        data = array(ColumnarWriter.TYPE_CODES[kind][0], values)
+        if sys.byteorder == 'big':
+            data.byteswap()
+        return data.tobytes()
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        chunks = [struct.pack("<I", len(rows))]
+        for (_, kind), values in zip(COLUMNS, zip(*rows)):
+            data = self._encode_column(values, kind)
+            chunks.append(struct.pack("<I", len(data)))
+            chunks.append(data)
+        self._stream.write(b"".join(chunks))
+
+    def close(self):
+        self._stream.write(struct.pack("<I", 0))
+
+
+def read_columnar(stream):
+    """逐个行组读取 .bhrc 文件，返回 {列名: 列数据列表}"""
+    if stream.read(len(ColumnarWriter.MAGIC)) != ColumnarWriter.MAGIC:
+        raise ValueError("不是有效的列式导出文件")
+    header_length, = struct.unpack("<I", stream.read(4))
+    schema = json.loads(stream.read(header_length).decode('utf8'))
+    while True:
+        row_count, = struct.unpack("<I", stream.read(4))
+        if row_count == 0:
+            return
+        group = {}
+        for name, kind in schema:
+            size, = struct.unpack("<I", stream.read(4))
+            data = stream.read(size)
+            if kind == "utf8":
+                lengths = array('I')
+                lengths.frombytes(data[:row_count * 4])
+                if sys.byteorder == 'big':
+                    lengths.byteswap()
+                values, pos = [], row_count * 4
+                for length in lengths:
+                    values.append(data[pos:pos + length].decode('utf8'))
+                    pos += length
+            else:
+                values = array('q' if kind == "int64" else 'd')
+                values.frombytes(data)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                values = values.tolist()
+            group[name] = values
+        yield group
+
+
+# 格式名 -> (写入类, 是否二进制, 扩展名)
+FORMATS = {
+    "csv": (CsvWriter, False, ".csv"),
+    "jsonl": (JsonlWriter, False, ".jsonl"),
+    "columnar": (ColumnarWriter, True, ".bhrc"),
+}
+
+
+def guess_format(path):
+    """根据扩展名推断导出格式，默认CSV"""
+    extension = os.path.splitext(path)[1].lower()
+    for name, (_, _, ext) in FORMATS.items():
+        if ext == extension:
+            return name
+    return "csv"
+
+
+def export_lines(lines, path, fmt=None, chunk_size=10000):
+    """流式解析原始记录行并按块写出，返回导出的记录数
+
+    lines 可以是任意可迭代对象（列表、文件对象等），内存占用只与 chunk_size 有关。
+    """
+    fmt = fmt or guess_format(path)
+    writer_class, binary, _ = FORMATS[fmt]
+    exported = 0
+    if binary:
+        stream = open(path, 'wb')
+    else:
+        # utf-8-sig 让Excel能正确识别中文
+        stream = open(path, 'w', encoding='utf-8-sig' if fmt == "csv" else 'utf8', newline='')
+    with stream:
+        writer = writer_class(stream)
+        chunk = []
+        for line in lines:
+            record = models.DataAnalyzer.parse_line(line.rstrip('\r\n'))
+            if record is None:
+                continue
+            chunk.append(record_to_row(record))
+            if len(chunk) >= chunk_size:
+                writer.write_rows(chunk)
+                exported += len(chunk)
+                chunk = []
+        writer.write_rows(chunk)
+        exported += len(chunk)
+        writer.close()
+    return exported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把原始记录文件导出为 CSV / JSONL / 列式二进制文件")
+    parser.add_argument("input", help="原始记录文件（每行一条），'-' 表示标准输入")
+    parser.add_argument("output", help="输出文件")
+    parser.add_argument("--format", choices=list(FORMATS), help="导出格式（默认按扩展名推断）")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="每次写出的记录数")
+    args = parser.parse_args(argv)
+
+    if args.input == '-':
+        count = export_lines(sys.stdin, args.output, args.format, args.chunk_size)
+    else:
+        with open(args.input, encoding='utf8') as source:
+            count = export_lines(source, args.output, args.format, args.chunk_size)
+    print(f"已导出 {count} 条记录到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
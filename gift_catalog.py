@@ -0,0 +1,75 @@
+import json
+import os
+import threading
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gifts.json")
+
+
+class GiftCatalog:
+    """礼物目录：从数据文件加载，编译为整数键的查找表，文件修改后可热加载
+
+    gifts.json 格式：
+        {"gifts": {礼物名: 豆数}, "lucky_gifts": {幸运礼物名: 单倍豆数}}
+    gifts.json 是价格的唯一来源：首次加载失败时目录为空（礼物豆数记为0），并通过 error 提示。
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._mtime = None
+        self._reload_lock = threading.Lock()
+        self._last_error = None  # 同一错误只提示一次
+        # (礼物名 -> 豆数, 单倍豆数 -> 幸运礼物名)，整体替换以保证读取一致
+        self._tables = self.compile({})
+        try:
+            self.load()
+        except Exception as e:
+            # 文件修复后由 reload_if_changed 重新加载
+            self._last_error = str(e)
+            print(f"礼物目录加载失败，礼物豆数将记为0: {e}")
+
+    @staticmethod
+    def compile(data):
+        """把目录数据编译为查找表"""
+        gift_beans = {name.strip(): int(beans) for name, beans in data.get("gifts", {}).items()}
+        lucky_by_price = {int(price): name.strip() for name, price in data.get("lucky_gifts", {}).items()}
+        return gift_beans, lucky_by_price
+
+    def load(self):
+        """加载（或重新加载）数据文件"""
+        with self._reload_lock:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, encoding='utf8') as f:
+                tables = self.compile(json.load(f))
+            self._tables = tables
+            self._mtime = mtime
+
+    def reload_if_changed(self):
+        """数据文件修改时间变化时重新加载，返回是否发生了重新加载"""
+        try:
+            if os.path.getmtime(self.path) == self._mtime:
+                return False
+            self.load()
+            self._last_error = None
+            return True
+        except Exception as e:
+            # 保留旧的查找表
+            if str(e) != self._last_error:
+                self._last_error = str(e)
+                print(f"礼物目录加载失败: {e}")
+            return False
+
+    @property
+    def error(self):
+        """最近一次加载失败的原因，加载成功时为 None"""
+        return self._last_error
+
+    def gift_beans(self, name, default=0):
+        """礼物名 -> 豆数"""
+        return self._tables[0].get(name, default)
+
+    def lucky_gift(self, price):
+        """单倍豆数 -> 幸运礼物名，未收录时返回 None"""
+        return self._tables[1].get(price)
+
+
+CATALOG = GiftCatalog()
@@ -0,0 +1,98 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import defaultdict
+
+import models
+
+
+class RollingLeaderboard:
+    """滑动窗口排行榜，随记录流入增量维护，无需重新扫描"""
+
+    # 窗口名称 -> 窗口长度（秒）
+    WINDOWS = {
+        "5分钟": 5 * 60,
+        "1小时": 60 * 60,
+        "24小时": 24 * 60 * 60,
+    }
+    # 分组维度 -> 显示名称
+    DIMENSIONS = {
+        "user": "用户",
+        "gift": "礼物",
+        "gift_type": "礼物分类",
+        "receiver": "赠送目标",
+    }
+
+    def __init__(self, windows=None):
+        self.windows = dict(windows or self.WINDOWS)
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        # 每个窗口一个按时间排序的事件堆：(时间戳, 序号, 豆数, 分组键)
+        self._events = {name: [] for name in self.windows}
+        # totals[窗口][维度][键] = [豆数, 次数]
+        self._totals = {name: {dim: defaultdict(lambda: [0, 0]) for dim in self.DIMENSIONS}
+                        for name in self.windows}
+
+    @staticmethod
+    def _group_keys(record):
+        keys = {
+            "user": record.user,
+            "gift": record.gift,
+            "gift_type": record.gift_type,
+        }
+        receiver = getattr(record, 'receiver', None)
+        if receiver:
+            keys["receiver"] = receiver
+        return keys
+
+    def add(self, record, now=None):
+        """加入一条记录，已超出窗口范围的记录会被忽略"""
+        timestamp = models.parse_record_time(record.time)
+        if timestamp is None:
+            return
+        value = models.record_value(record)
+        keys = self._group_keys(record)
+        now = time.time() if now is None else now
+        with self._lock:
+            for name, length in self.windows.items():
+                if timestamp < now - length:
+                    continue
+                heapq.heappush(self._events[name], (timestamp, next(self._seq), value, keys))
+                totals = self._totals[name]
+                for dim, key in keys.items():
+                    entry = totals[dim][key]
+                    entry[0] += value
+                    entry[1] += 1
+            self._expire(now)
+
+    def _expire(self, now):
+        """移出各窗口中已过期的事件"""
+        for name, length in self.windows.items():
+            events = self._events[name]
+            totals = self._totals[name]
+            cutoff = now - length
+            while events and events[0][0] < cutoff:
+                _, _, value, keys = heapq.heappop(events)
+                for dim, key in keys.items():
+                    entry = totals[dim][key]
+                    entry[0] -= value
+                    entry[1] -= 1
+                    if entry[1] <= 0:
+                        del totals[dim][key]
+
+    def top(self, window, dimension, limit=10, now=None):
+        """返回 [(键, 豆数, 次数), ...]，按豆数降序"""
+        with self._lock:
+            self._expire(time.time() if now is None else now)
+            totals = self._totals[window][dimension]
+            best = heapq.nlargest(limit, totals.items(), key=lambda item: item[1][0])
+            return [(key, beans, count) for key, (beans, count) in best]
+
+    def format_text(self, window, dimension, limit=5, now=None):
+        """生成推送到vMix的排行榜文本"""
+        rows = self.top(window, dimension, limit, now)
+        if not rows:
+            return ""
+        parts = [f"{i}. {key} {beans:,}豆" for i, (key, beans, _) in enumerate(rows, 1)]
+        return f"近{window}{self.DIMENSIONS[dimension]}榜: " + "  ".join(parts) + "   "
@@ -1,63 +1,50 @@
 import os
-import requests
-from autobahn.asyncio.websocket import WebSocketClientProtocol, WebSocketClientFactory
-import asyncio
 import threading
 import json
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-from txaio import make_logger
+from tkinter import ttk, scrolledtext
 from threading import Timer
-from apscheduler.schedulers.background import BackgroundScheduler
 import datetime
 import concurrent.futures
 import queue
 import time
 from functools import partial
+from collections import defaultdict
 
 import models
-
-# 定义礼物对应的豆数
-GIFT_VALUES = {
-    "神秘人": 38,
-    "插画师": 198,
-    "医生": 688,
-    "拳击手": 2688,
-    "机长": 5688,
-    "超级影帝": 15888
-}
-
-
-class MyClientProtocol(WebSocketClientProtocol):
-    def __init__(self):
-        WebSocketClientProtocol.__init__(self)
-        self.lucky_gift_timer = None
-        self.log = make_logger()
-        self.app = None  # 将在工厂中设置
-
-    def onConnect(self, response):
-        if self.app:
-            self.app.safe_ui_update(self.app.update_status, f"正在连接: {response.peer}")
-
-    def onOpen(self):
-        if self.app:
-            self.app.protocol = self  # 保存协议引用
-            self.app.safe_ui_update(self.app.connection_success)
-
-    def onMessage(self, payload, isBinary):
-        if not self.app:
-            return
-
-        if isBinary:
-            message = f"二进制消息 ({len(payload)} bytes)"
-        else:
-            # 将消息处理交给线程池
-            self.app.thread_pool.submit(self.app.process_message, payload)
-
-    def onClose(self, wasClean, code, reason):
-        if self.app:
-            self.app.safe_ui_update(self.app.update_status, f"连接关闭: {reason} (code: {code})")
-            self.app.safe_ui_update(self.app.reset_connection)
+import transport
+from leaderboard import RollingLeaderboard
+from rollup import MinuteRollup
+from record_store import RecordStore
+from snapshot import SnapshotStore
+from alerts import AlertEngine, AlertQueue, load_rules
+
+# 导入 main 的耗时预算（秒），由 tests/test_startup.py 检查
+STARTUP_BUDGET = 1.0
+
+# 解析时每块的行数，以及改用进程池解析的行数下限
+ANALYSIS_CHUNK_SIZE = 2000
+PROCESS_POOL_THRESHOLD = 20000
+# 填充分析表格时每次插入的行数，以及每轮处理UI更新请求的最长时间（秒）
+TABLE_CHUNK_SIZE = 500
+UI_TICK_BUDGET = 0.05
+
+
+def set_vmix_text(input_name, selected_name, text):
+    """调用vMix API设置指定输入的文本"""
+    import requests  # 首次调用时再加载，加快启动
+    params = {
+        "Function": "SetText",
+        "Input": input_name,
+        "SelectedName": selected_name,
+        "Value": text
+    }
+    try:
+        response = requests.get("http://localhost:8088/api/", params=params, timeout=3)
+        if response.status_code == 200:
+            print(f'vMix更新成功: {input_name}-{response.text}')
+    except Exception as e:
+        print(f'vMix API调用失败: {input_name}-{e}')
 
 
 def setup_treeview_sorting(tree):
@@ -103,12 +90,32 @@ class WebSocketClientApp:
         self.thread = None
         self.connected = False
         self.factory = None
-        self.records_data = {}  # 存储所有记录数据
-        self.current_records = {}  # 当前显示的记录
+        self.records_data = transport.SyncRecords({})  # 存储所有记录数据（按文件延迟解码）
+        self.current_files = []  # 当前日期下的文件类型
         self.auto_analyze = True  # 自动分析标志
+        self.leaderboard = RollingLeaderboard()  # 滑动窗口排行榜
+        self.rollup = MinuteRollup()  # 每分钟统计
+        self.record_store = RecordStore()  # 同步数据与实时消息对账后分发给各统计
+        self.record_store.add_sink(self.on_record_ingested)
+        self.alert_engine = AlertEngine(load_rules())  # 出奖提醒规则见 alert_rules.json
+        self.alert_queue = AlertQueue(show=self.update_vmix_alert, restore=self.restore_vmix_ticker)
+        self.ingested_offsets = {}  # (日期, 文件) -> 已入库的行数
+        self.file_rows = {}  # (日期, 文件) -> 入库时生成的分析表格行，分析时直接使用
+        self.file_kinds = defaultdict(set)  # (日期, 文件) -> {(记录类型, 日期前缀)}
+        self.ingest_lock = threading.Lock()
 
         # 创建线程池 (4个工作线程)
         self.thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        self.process_pool = None  # 分析大文件时再创建
+        self.analysis_generation = 0  # 分析编号（由快照库分配），用于丢弃过期的分析结果
+        self.analyzed_rows = 0  # 表格中的行数（用于奇偶行颜色）
+        self.analysis_pending = False  # 分析进行中，表格内容尚不完整
+        self.snapshots = SnapshotStore()  # 分析结果快照，供过滤等后台任务无锁读取
+        self.table_state = None  # 表格显示的 (日期, 文件, 过滤文本)
+        self.table_rows = 0  # 该文件中已填充到表格（并经过滤）的同步行数
+        self.live_items = {}  # 实时记录编号 -> 表格中的项
+        self.ticker_best = None  # 滚动字幕中的最大出奖记录
+        self.ticker_recent = []  # 滚动字幕中的最近记录
 
         # 创建消息队列用于线程间通信
         self.message_queue = queue.Queue()
@@ -122,25 +129,59 @@ class WebSocketClientApp:
         # 创建主内容区域
         self.main_notebook = ttk.Notebook(self.root)
         self.main_notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.lazy_tabs = {}  # 尚未构建的标签页: 框架名 -> (框架, 构建函数)
+        self.main_notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
 
         # 创建消息标签页
         self.create_message_tab()
 
-        # 创建数据分析标签页
-        self.create_analysis_tab()
+        if models.CATALOG.error:
+            self.display_message("系统", f"礼物目录 gifts.json 加载失败，礼物豆数将记为0: {models.CATALOG.error}")
+
+        # 其余标签页在首次查看（或首次需要）时再构建
+        self.analysis_frame = self.add_lazy_tab("数据分析", self.create_analysis_tab)
+        self.add_lazy_tab("排行榜", self.create_leaderboard_tab)
+        self.add_lazy_tab("实时统计", self.create_throughput_tab)
+
+    def add_lazy_tab(self, text, builder):
+        """添加一个延迟构建的标签页"""
+        frame = tk.Frame(self.main_notebook)
+        self.main_notebook.add(frame, text=text)
+        self.lazy_tabs[str(frame)] = (frame, builder)
+        return frame
+
+    def build_lazy_tab(self, frame_name):
+        """构建尚未构建的标签页内容"""
+        entry = self.lazy_tabs.pop(str(frame_name), None)
+        if entry:
+            frame, builder = entry
+            builder(frame)
+
+    def on_tab_changed(self, event=None):
+        """切换标签页时构建对应内容"""
+        self.build_lazy_tab(self.main_notebook.select())
+
+    def ensure_analysis_tab(self):
+        """确保数据分析标签页已构建（同步数据到达时需要其中的控件）"""
+        self.build_lazy_tab(self.analysis_frame)
 
     def process_pending_messages(self):
-        """处理来自后台线程的UI更新请求"""
+        """处理来自后台线程的UI更新请求，每轮最多占用 UI_TICK_BUDGET 秒，其余留到下一轮"""
+        deadline = time.perf_counter() + UI_TICK_BUDGET
+        delay = 100
         try:
             while True:
                 # 非阻塞获取消息
                 callback, args = self.message_queue.get_nowait()
                 callback(*args)
+                if time.perf_counter() >= deadline:
+                    delay = 1  # 先让界面响应输入和重绘，再尽快处理剩余的请求
+                    break
         except queue.Empty:
             pass
         finally:
             # 继续定期检查
-            self.root.after(100, self.process_pending_messages)
+            self.root.after(delay, self.process_pending_messages)
 
     def safe_ui_update(self, callback, *args):
         """安全地在UI线程中执行回调"""
@@ -150,43 +191,122 @@ class WebSocketClientApp:
         """在后台线程中处理消息"""
         try:
             message = payload.decode('utf8')
-            data = json.loads(message)
+            if len(message) < transport.LAZY_ENVELOPE_MIN_SIZE:
+                self.dispatch_message(json.loads(message))
+                return
+            try:
+                # 大帧先只读取 msgType，msgExtra 按需解码
+                envelope = transport.LazyEnvelope(message)
+            except ValueError:
+                self.dispatch_message(json.loads(message))
+                return
+            if envelope.msg_type == transport.SYNC_MSG_TYPE:
+                self.handle_sync_message(envelope.inner_type(), envelope.records)
+            else:
+                self.dispatch_message({"msgType": envelope.msg_type, "msgExtra": envelope.msg_extra()})
+        except Exception as e:
+            print(f"消息处理出错: {e}")
+
+    def process_binary_message(self, payload):
+        """在后台线程中处理二进制消息（长度前缀同步数据 / MessagePack）"""
+        try:
+            self.dispatch_message(transport.decode_binary_message(payload))
+        except Exception as e:
+            print(f"二进制消息处理出错 ({len(payload)} bytes): {e}")
+
+    def dispatch_message(self, data):
+        """根据消息类型处理已解码的消息"""
+        try:
             msg_type = data.get("msgType")
             msg_extra = data.get("msgExtra", {})
 
             # 根据消息类型处理
             if msg_type == 28:
                 self.handle_exit_message(msg_extra)
-            elif msg_type == 1995:
-                self.safe_ui_update(self.display_message, "接收", "收到同步数据")
-                if msg_extra.get("msgType") == "lotteryRecords":
-                    records = msg_extra.get("msgExtra", {})
-                    self.safe_ui_update(self.process_records, records)
+            elif msg_type == transport.SYNC_MSG_TYPE:
+                self.handle_sync_message(msg_extra.get("msgType"),
+                                         lambda: transport.SyncRecords(msg_extra.get("msgExtra", {})))
             elif msg_type == 233:
                 parsed_msg = models.LiveMessageParser.convert_special_message(msg_extra)
                 self.safe_ui_update(self.display_message, "接收", parsed_msg)
+                self.handle_live_message(msg_extra)
             else:
                 self.safe_ui_update(self.display_message, "接收", msg_extra)
         except Exception as e:
             print(f"消息处理出错: {e}")
 
+    def handle_sync_message(self, inner_type, read_records):
+        """处理同步数据，只有需要的内层类型才调用 read_records() 解码记录"""
+        self.safe_ui_update(self.display_message, "接收", "收到同步数据")
+        if inner_type == "lotteryRecords":
+            records = read_records()
+            # 先在当前后台线程中解析入库，分析表格直接使用入库时生成的行
+            self.ingest_records(records)
+            self.safe_ui_update(self.process_records, records)
+
+    def handle_live_message(self, line):
+        """实时消息中的礼物/抽奖记录直接入库并显示，不必等下一次同步"""
+        if not isinstance(line, str) or not line.strip():
+            return
+        if models.parse_record_time(line) is None:
+            # 实时消息不带时间时补上本地时间，格式与同步数据一致
+            now = datetime.datetime.now()
+            line = f"{now:%Y年%m月%d日 %H:%M:%S}.{now.microsecond // 1000:03d} {line.strip()}"
+        message_type = models.LiveMessageParser.determine_message_type(line)
+        record = models.DataAnalyzer.parse_line(line, message_type)
+        if record is None:
+            return
+        timestamp = models.parse_record_time(line)
+        live_id = self.record_store.add_live(message_type, timestamp, record)
+        if live_id is None:
+            return  # 同步数据中已有这条记录
+        target = self.live_file_for(record)
+        if target is None:
+            return
+        row = models.DataAnalyzer.record_to_row(record)
+        live, snapshot = self.snapshots.add_live(target[0], target[1], live_id, row)
+        self.safe_ui_update(self.show_live_record, live, snapshot)
+
+    def live_file_for(self, record):
+        """同步数据中包含同类、同一天记录的 (日期, 文件)，没有时返回 None"""
+        kind = (type(record).__name__, record.time[:11])
+        for key, kinds in list(self.file_kinds.items()):
+            if kind in kinds:
+                return key
+        return None
+
+    def show_live_record(self, live, snapshot):
+        """实时记录所在文件正在显示时，把这一行追加到分析表格并直接更新滚动字幕"""
+        if (str(self.analysis_frame) in self.lazy_tabs or self.analysis_pending
+                or snapshot is not self.snapshots.current
+                or (snapshot.date, snapshot.file_type) != (self.date_var.get(), self.file_var.get())):
+            return  # 之后的分析或过滤会从快照中带上这条记录
+        filter_text, filter_items = self.current_filter()
+        values = live.row[1]
+        if not self.row_matches(values, filter_items):
+            return
+        at_bottom = self.result_tree.yview()[1] >= 1.0
+        self.insert_live_row(live)
+        if at_bottom:
+            self.result_tree.yview_moveto(1.0)
+
+        # 只用新记录更新滚动字幕，不重新扫描整张表
+        if self.ticker_best is None or int(values[5]) >= int(self.ticker_best[5]):
+            self.ticker_best = values
+        self.ticker_recent = (self.ticker_recent + [values])[-3:]
+        self.push_ticker_text(self.compose_ticker_text(self.ticker_best, self.ticker_recent, filter_text))
+
+    def insert_live_row(self, live):
+        """插入一条实时记录行，并记下它在表格中的项，便于对账后移除"""
+        tags = ('evenrow',) if self.analyzed_rows % 2 == 0 else ('oddrow',)
+        self.live_items[live.live_id] = self.result_tree.insert("", "end", values=live.row[1], tags=tags)
+        self.analyzed_rows += 1
+
     def handle_exit_message(self, msg_extra):
         """处理退出消息"""
         try:
             # 发送到vMix的操作放到线程池
-            def update_vmix_text(text):
-                params = {
-                    "Function": "SetText",
-                    "Input": "退出直播间消息",
-                    "SelectedName": "Text-Title.Text",
-                    "Value": text
-                }
-                try:
-                    response = requests.get("http://localhost:8088/api/", params=params, timeout=3)
-                    if response.status_code == 200:
-                        print(f'vMix更新成功: 退出直播间消息-{response.text}')
-                except Exception as e:
-                    print(f'vMix API调用失败: 退出直播间消息-{e}')
+            update_vmix_text = partial(set_vmix_text, "退出直播间消息", "Text-Title.Text")
 
             # 立即更新
             self.thread_pool.submit(update_vmix_text, msg_extra)
@@ -254,11 +374,9 @@ class WebSocketClientApp:
 
         tk.Button(send_frame, text="发送", command=self.send_message).pack(side=tk.LEFT)
 
-    def create_analysis_tab(self):
+    def create_analysis_tab(self, analysis_frame):
         """创建数据分析标签页"""
         self.rec_final_text = ''
-        analysis_frame = tk.Frame(self.main_notebook)
-        self.main_notebook.add(analysis_frame, text="数据分析")
 
         # 控制面板
         control_frame = tk.Frame(analysis_frame, bd=1, relief=tk.RIDGE, padx=5, pady=5)
@@ -290,12 +408,19 @@ class WebSocketClientApp:
         self.file_combobox.bind("<<ComboboxSelected>>", self.on_file_selected)
 
         # 分析按钮
-        analyze_btn = tk.Button(control_frame, text="分析数据", command=self.analyze_data)
-        analyze_btn.pack(pady=5)
+        button_frame = tk.Frame(control_frame)
+        button_frame.pack(pady=5)
+        analyze_btn = tk.Button(button_frame, text="分析数据", command=partial(self.analyze_data, rebuild=True))
+        analyze_btn.pack(side=tk.LEFT, padx=5)
+        export_btn = tk.Button(button_frame, text="导出数据", command=self.export_data)
+        export_btn.pack(side=tk.LEFT, padx=5)
         self.filter_var = tk.StringVar()
         self.filter_var.trace("w", self.filter_treeview)  # 当文本变化时自动过滤
         self.filter_entry = tk.Entry(control_frame, textvariable=self.filter_var)
         self.filter_entry.pack(pady=5)
+        # 分析进度
+        self.analysis_progress = ttk.Progressbar(control_frame, mode='determinate')
+        self.analysis_progress.pack(fill=tk.X, pady=2)
         # 统计信息
         self.summary_var = tk.StringVar()
         summary_label = tk.Label(control_frame, textvariable=self.summary_var,
@@ -359,95 +484,221 @@ class WebSocketClientApp:
         result_frame.grid_rowconfigure(0, weight=1)
         result_frame.grid_columnconfigure(0, weight=1)
 
-    def filter_treeview(self, *args):
-        """优化后的过滤方法"""
+    def create_leaderboard_tab(self, leaderboard_frame):
+        """创建排行榜标签页"""
+
+        control_frame = tk.Frame(leaderboard_frame, bd=1, relief=tk.RIDGE, padx=5, pady=5)
+        control_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        tk.Label(control_frame, text="时间窗口:").pack(side=tk.LEFT)
+        self.board_window_var = tk.StringVar(value="1小时")
+        window_combobox = ttk.Combobox(control_frame, textvariable=self.board_window_var, state="readonly",
+                                       values=list(RollingLeaderboard.WINDOWS), width=10)
+        window_combobox.pack(side=tk.LEFT, padx=5)
+        window_combobox.bind("<<ComboboxSelected>>", lambda e: self.refresh_leaderboard(reschedule=False))
+
+        tk.Label(control_frame, text="分组:").pack(side=tk.LEFT)
+        self.board_dimension_names = {name: dim for dim, name in RollingLeaderboard.DIMENSIONS.items()}
+        self.board_dimension_var = tk.StringVar(value="用户")
+        dimension_combobox = ttk.Combobox(control_frame, textvariable=self.board_dimension_var, state="readonly",
+                                          values=list(self.board_dimension_names), width=10)
+        dimension_combobox.pack(side=tk.LEFT, padx=5)
+        dimension_combobox.bind("<<ComboboxSelected>>", lambda e: self.refresh_leaderboard(reschedule=False))
+
+        tk.Button(control_frame, text="推送到vMix", command=self.push_leaderboard).pack(side=tk.LEFT, padx=5)
+        self.board_auto_push_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(control_frame, text="自动推送", variable=self.board_auto_push_var).pack(side=tk.LEFT)
+
+        self.board_tree = ttk.Treeview(leaderboard_frame, columns=('rank', 'name', 'beans', 'count'),
+                                       show='headings')
+        self.board_tree.heading('rank', text='排名')
+        self.board_tree.heading('name', text='名称')
+        self.board_tree.heading('beans', text='豆数')
+        self.board_tree.heading('count', text='次数')
+        self.board_tree.column('rank', width=60, anchor=tk.CENTER, minwidth=1)
+        self.board_tree.column('name', width=250, anchor=tk.W, minwidth=1)
+        self.board_tree.column('beans', width=150, anchor=tk.E, minwidth=1)
+        self.board_tree.column('count', width=100, anchor=tk.E, minwidth=1)
+        self.board_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.board_text = ''
+        self.root.after(5000, self.refresh_leaderboard)
+
+    def refresh_leaderboard(self, reschedule=True):
+        """刷新排行榜表格（定时执行）"""
+        try:
+            window = self.board_window_var.get()
+            dimension = self.board_dimension_names[self.board_dimension_var.get()]
+            rows = self.leaderboard.top(window, dimension, limit=20)
+            self.board_tree.delete(*self.board_tree.get_children())
+            for rank, (key, beans, count) in enumerate(rows, 1):
+                self.board_tree.insert("", "end", values=(rank, key, f"{beans:,}", count))
+            if self.board_auto_push_var.get():
+                self.push_leaderboard()
+        except Exception as e:
+            print(f"刷新排行榜出错: {e}")
+        finally:
+            if reschedule:
+                self.root.after(5000, self.refresh_leaderboard)
+
+    def push_leaderboard(self):
+        """把当前排行榜推送到vMix（内容未变化时跳过）"""
+        window = self.board_window_var.get()
+        dimension = self.board_dimension_names[self.board_dimension_var.get()]
+        text = self.leaderboard.format_text(window, dimension)
+        if text and text != self.board_text:
+            self.board_text = text
+            self.thread_pool.submit(set_vmix_text, "排行榜", "Text-Title.Text", text)
+
+    def create_throughput_tab(self, throughput_frame):
+        """创建实时统计标签页（近60分钟每分钟豆数）"""
+
+        control_frame = tk.Frame(throughput_frame, bd=1, relief=tk.RIDGE, padx=5, pady=5)
+        control_frame.pack(fill=tk.X, padx=5, pady=5)
+        tk.Label(control_frame, text="消息类型:").pack(side=tk.LEFT)
+        self.chart_types = {t.name: t for t in models.LiveMessageParser.MessageType}
+        self.chart_type_var = tk.StringVar(value="全部")
+        type_combobox = ttk.Combobox(control_frame, textvariable=self.chart_type_var, state="readonly",
+                                     values=["全部"] + list(self.chart_types), width=20)
+        type_combobox.pack(side=tk.LEFT, padx=5)
+        type_combobox.bind("<<ComboboxSelected>>", lambda e: self.refresh_throughput(reschedule=False))
+
+        self.chart_summary_var = tk.StringVar()
+        tk.Label(throughput_frame, textvariable=self.chart_summary_var, anchor=tk.W,
+                 font=('Microsoft YaHei', 10)).pack(fill=tk.X, padx=5)
+
+        self.chart_canvas = tk.Canvas(throughput_frame, background="#FFFFFF")
+        self.chart_canvas.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.root.after(5000, self.refresh_throughput)
+
+    def refresh_throughput(self, reschedule=True):
+        """重绘每分钟豆数柱状图（定时执行）"""
+        try:
+            selected = self.chart_type_var.get()
+            message_types = [self.chart_types[selected]] if selected in self.chart_types else list(self.chart_types.values())
+            end = time.time()
+            start = end - 59 * 60
+            beans = [0] * 60
+            counts = [0] * 60
+            histogram = [0] * len(MinuteRollup.MULTIPLE_BUCKETS)
+            for message_type in message_types:
+                for i, (_, b, c) in enumerate(self.rollup.series(message_type, start, end)):
+                    beans[i] += b
+                    counts[i] += c
+                for i, n in enumerate(self.rollup.histogram(message_type, start, end)):
+                    histogram[i] += n
+
+            canvas = self.chart_canvas
+            canvas.delete("all")
+            width = max(canvas.winfo_width(), 60)
+            height = max(canvas.winfo_height(), 20)
+            peak = max(beans) or 1
+            bar_width = width / len(beans)
+            for i, b in enumerate(beans):
+                bar_height = (height - 10) * b / peak
+                canvas.create_rectangle(i * bar_width + 1, height - bar_height, (i + 1) * bar_width - 1, height,
+                                        fill="#4CAF50", outline="")
+
+            buckets = "  ".join(f"{low}+倍:{n}" for low, n in zip(MinuteRollup.MULTIPLE_BUCKETS, histogram) if n)
+            self.chart_summary_var.set(f"近60分钟 共 {sum(counts)} 条 {sum(beans):,} 豆  峰值 {max(beans):,} 豆/分钟  {buckets}")
+        except Exception as e:
+            print(f"刷新实时统计出错: {e}")
+        finally:
+            if reschedule:
+                self.root.after(5000, self.refresh_throughput)
+
+    @staticmethod
+    def row_matches(values, filter_items):
+        """表格行是否匹配过滤条件（多个条件用 | 分隔，任一匹配即可）"""
+        return any(any(f_item in str(val).lower() for val in values) for f_item in filter_items)
+
+    def compose_ticker_text(self, best, recent, filter_text):
+        """根据最大出奖记录和最近3条记录拼接滚动字幕文本"""
+        if best is not None:
+            # 提取关键字段
+            time = best[0].split()[1]  # 提取时间部分 "21:10:11"
+            anchor_name = best[2]  # "90岁风韵犹存你太奶"
+            gift_name = best[3]  # "幸运魔镜"
+            multiple = best[5]  # "1000"
+            beans = best[4]  # "36000"
+            # 拼接成目标文本
+            self.result = f"近期最大出奖 {time} {anchor_name} 抽出 {gift_name} {multiple} 倍 共 {beans} 豆。   "
+        final_text = self.result or ""
+        for values in reversed(recent):
+            time_str = values[0]
+            username = values[2]
+            gift = values[3]
+            beans = values[4]
+            multiplier = values[5]
+            formatted_time = time_str.split(" ")[1]
+
+            line = (f"{formatted_time} [{filter_text}] {username} "
+                    f"抽中 {multiplier} 倍 {gift}，获得 {beans} 豆。   ")
+            final_text += line
+        return final_text
+
+    def push_ticker_text(self, final_text):
+        """滚动字幕内容变化时推送到vMix"""
+        if self.rec_final_text != final_text:
+            self.rec_final_text = final_text
+            self.thread_pool.submit(self.update_vmix_text, final_text)
+
+    def current_filter(self):
+        """返回 (过滤文本, 过滤项列表)"""
         filter_text = self.filter_var.get().lower()
-        filter_items = [item.strip() for item in filter_text.split('|')]
+        return filter_text, [item.strip() for item in filter_text.split('|')]
+
+    def filter_treeview(self, *args):
+        """过滤条件变化时重新填充表格：快照中的行按块过滤后流式插入，不再整表重建"""
+        self.analyze_data(rebuild=True)
+
+    def refresh_ticker(self):
+        """在后台线程中根据最新快照重新计算滚动字幕（不改动表格）"""
+        filter_text, filter_items = self.current_filter()
+        snapshot = self.snapshots.current
 
-        # 在后台线程中执行过滤和准备数据
-        def do_filter():
+        def do_refresh():
             try:
-                # 准备数据
-                all_matched_items = []
-                output_lines = []
-
-                # 获取当前所有项
-                all_items = [(self.result_tree.item(item, "values"),
-                              self.result_tree.item(item, "tags"))
-                             for item in self.result_tree.get_children()]
-
-                # 过滤数据
-                filtered_data = []
-                for values, tags in all_items:
-                    if any(any(f_item in str(val).lower() for val in values)
-                           for f_item in filter_items):
-                        filtered_data.append((values, tags))
-                # 提取第6个项（倍数）并转换为整数
-                multiples = [int(item[0][5]) for item in filtered_data]
-                # 找到最大的倍数
-                max_multiple = max(multiples)
-                # 找到对应的记录
-                max_records = [item for item in filtered_data if int(item[0][5]) == max_multiple]
-                print("最大的倍数是:", max_multiple)
-                print("对应的记录是:")
-                for record in max_records:
-                    # 提取关键字段
-                    time = record[0][0].split()[1]  # 提取时间部分 "21:10:11"
-                    anchor_name = record[0][2]  # "90岁风韵犹存你太奶"
-                    gift_name = record[0][3]  # "幸运魔镜"
-                    multiple = record[0][5]  # "1000"
-                    beans = record[0][4]  # "36000"
-                    # 拼接成目标文本
-                    self.result = f"近期最大出奖 {time} {anchor_name} 抽出 {gift_name} {multiple} 倍 共 {beans} 豆。   "
-                # 准备输出文本
-                items_to_output = filtered_data[-3:] if len(filtered_data) > 3 else filtered_data
-                items_to_output.reverse()
-                final_text = self.result
-                for values, _ in items_to_output:
-                    time_str = values[0]
-                    username = values[2]
-                    gift = values[3]
-                    beans = values[4]
-                    multiplier = values[5]
-                    formatted_time = time_str.split(" ")[1]
-
-                    line = (f"{formatted_time} [{filter_text}] {username} "
-                            f"抽中 {multiplier} 倍 {gift}，获得 {beans} 豆。   ")
-                    final_text += line
-
-                # 更新UI
-                def update_ui():
-                    # 清空并重新插入过滤后的项
-                    self.result_tree.delete(*self.result_tree.get_children())
-                    for i, (values, tags) in enumerate(filtered_data):
-                        self.result_tree.insert("", "end", values=values, tags=tags)
+                # 只读取不可变快照，不访问Tk控件
+                all_values = [values for _, values in snapshot.rows if self.row_matches(values, filter_items)]
+                # 倍数最大的记录（有多条时取最后一条）
+                best = None
+                for values in all_values:
+                    if best is None or int(values[5]) >= int(best[5]):
+                        best = values
+                recent = all_values[-3:]
 
-                    # 更新vMix
-                    if hasattr(self, 'rec_final_text') and self.rec_final_text != final_text:
-                        self.rec_final_text = final_text
-                        self.thread_pool.submit(self.update_vmix_text, final_text)
+                def update_ui():
+                    if filter_text != self.filter_var.get().lower():
+                        return  # 过滤条件已变化，新的分析完成后会再次计算
+                    if snapshot is not self.snapshots.current:
+                        self.refresh_ticker()  # 期间有新的实时记录或快照，基于最新快照重新计算
+                        return
+                    self.ticker_best, self.ticker_recent = best, recent
+                    if all_values:
+                        self.push_ticker_text(self.compose_ticker_text(best, recent, filter_text))
 
                 self.safe_ui_update(update_ui)
 
             except Exception as e:
-                print(f"过滤出错: {e}")
+                print(f"滚动字幕更新出错: {e}")
 
-        self.thread_pool.submit(do_filter)
+        self.thread_pool.submit(do_refresh)
 
     def update_vmix_text(self, text):
-        """更新vMix文本的专用方法"""
-        params = {
-            "Function": "SetText",
-            "Input": "动态滚动1",
-            "SelectedName": "Ticker.Text",
-            "Value": text
-        }
-        try:
-            response = requests.get("http://localhost:8088/api/", params=params, timeout=3)
-            if response.status_code == 200:
-                print(f'vMix更新成功: {response.text}')
-        except Exception as e:
-            print(f'vMix API调用失败: {e}')
+        """更新vMix文本的专用方法（出奖提醒显示期间跳过，提醒结束后恢复最新内容）"""
+        if self.alert_queue.active:
+            return
+        set_vmix_text("动态滚动1", "Ticker.Text", text)
+
+    def update_vmix_alert(self, text):
+        """在滚动字幕位置显示出奖提醒"""
+        set_vmix_text("动态滚动1", "Ticker.Text", text)
+
+    def restore_vmix_ticker(self):
+        """出奖提醒结束后恢复滚动字幕"""
+        if self.rec_final_text:
+            set_vmix_text("动态滚动1", "Ticker.Text", self.rec_final_text)
 
     def toggle_auto_analyze(self):
         """切换自动分析状态"""
@@ -455,13 +706,14 @@ class WebSocketClientApp:
 
     def process_records(self, records):
         """处理接收到的记录数据时保持当前选中状态"""
-        # 1. 先保存当前选中的日期和文件类型
+        self.ensure_analysis_tab()
+
+        # 1. 先保存当前选中的日期
         current_date = self.date_var.get()
-        current_file = self.file_var.get()
 
         # 2. 更新数据源
         self.records_data = records
-        dates = list(records.keys())
+        dates = records.dates()
 
         # 3. 更新日期下拉框（保持原有选中项如果仍然存在）
         self.date_combobox['values'] = dates
@@ -471,111 +723,231 @@ class WebSocketClientApp:
                 self.date_var.set(current_date)
             else:  # 否则默认选第一个
                 self.date_var.set(dates[0])
-            self.on_date_selected()  # 触发日期变更事件
-
-            # 4. 尝试恢复之前选中的文件类型（如果存在）
-            if (current_file and
-                    current_date in self.records_data and
-                    current_file in self.records_data[current_date]):
-                self.file_var.set(current_file)
-                self.on_file_selected()
+            # 4. 触发日期变更事件（之前选中的文件类型仍然存在时保持选中），最后统一分析一次
+            self.on_date_selected(analyze=False)
 
             # 5. 如果启用了自动分析，则自动分析数据
             if self.auto_analyze:
                 self.analyze_data()
 
-    def on_date_selected(self, event=None):
-        """日期选择事件处理"""
+    def ingest_records(self, records):
+        """把同步数据中新增的行解析后入库，已由实时消息入库的记录只做对账（在后台线程中执行）
+
+        每行只解析一次：入库的同时生成分析表格行，存入 file_rows 供分析直接使用。
+        """
+        try:
+            # 每次同步检查一次礼物目录是否被修改
+            if models.CATALOG.reload_if_changed():
+                self.safe_ui_update(self.display_message, "系统", "礼物目录已重新加载")
+            reconciled = []  # 被同步数据对账或已过期的实时记录编号
+            with self.ingest_lock:
+                # 逐个文件解码和解析，同一时刻只有一个文件的原始行在内存中
+                for date, file_type, lines in records.items():
+                    key = (date, file_type)
+                    offset = self.ingested_offsets.get(key, 0)
+                    if len(lines) < offset:
+                        # 文件被截断，无法判断哪些是新行：重新生成表格行，但不再计入统计
+                        rows = [models.DataAnalyzer.record_to_row(record)
+                                for _, _, record in self.parse_lines(lines)]
+                        self.file_rows[key] = [row for row in rows if row]
+                        self.ingested_offsets[key] = len(lines)
+                        continue
+                    rows = self.file_rows.setdefault(key, [])
+                    for message_type, timestamp, record in self.parse_lines(lines[offset:]):
+                        if record:
+                            self.file_kinds[key].add((type(record).__name__, record.time[:11]))
+                            row = models.DataAnalyzer.record_to_row(record)
+                            if row:
+                                rows.append(row)
+                        live_id = self.record_store.add_synced(message_type, timestamp, record)
+                        if live_id is not None:
+                            reconciled.append(live_id)
+                    self.ingested_offsets[key] = len(lines)
+                reconciled.extend(self.record_store.expire(time.time()))
+            self.snapshots.remove_live(reconciled)
+        except Exception as e:
+            print(f"记录入库出错: {e}")
+
+    def parse_lines(self, lines):
+        """逐块解析原始行，产出 (消息类型, 时间戳, 记录)；行数较多时交给进程池以避开GIL"""
+        chunks = [lines[i:i + ANALYSIS_CHUNK_SIZE] for i in range(0, len(lines), ANALYSIS_CHUNK_SIZE)]
+        if len(lines) >= PROCESS_POOL_THRESHOLD:
+            pool = self.get_process_pool()
+            results = (future.result() for future in
+                       [pool.submit(models.DataAnalyzer.parse_batch, chunk) for chunk in chunks])
+        else:
+            results = (models.DataAnalyzer.parse_batch(chunk) for chunk in chunks)
+        for parsed in results:
+            yield from parsed
+
+    def on_record_ingested(self, message_type, timestamp, record):
+        """记录入库后更新各统计（可能在任意后台线程中调用）"""
+        if timestamp is not None:
+            self.rollup.add_record(message_type, timestamp, record)
+        if record:
+            self.leaderboard.add(record)
+            for rule, text in self.alert_engine.evaluate(record, timestamp):
+                self.alert_queue.push(rule.priority, text)
+                self.safe_ui_update(self.display_message, "提醒", text)
+
+    def on_date_selected(self, event=None, analyze=True):
+        """日期选择事件处理，当前文件类型在该日期中仍然存在时保持选中"""
+        self.cancel_analysis()
         selected_date = self.date_var.get()
-        if selected_date in self.records_data:
-            self.current_records = self.records_data[selected_date]
-            file_types = list(self.current_records.keys())
+        if selected_date in self.records_data.dates():
+            self.current_files = file_types = self.records_data.files(selected_date)
             self.file_combobox['values'] = file_types
             if file_types:
-                self.file_var.set(file_types[0])
-                self.on_file_selected()
-
-                # 如果启用了自动分析，则自动分析数据
-                if self.auto_analyze:
-                    self.analyze_data()
+                if self.file_var.get() not in file_types:
+                    self.file_var.set(file_types[0])
+                self.on_file_selected(analyze=analyze)
 
-    def on_file_selected(self, event=None):
-        """文件类型选择事件处理"""
+    def on_file_selected(self, event=None, analyze=True):
+        """文件类型选择事件处理；analyze 为假时由调用方稍后统一分析"""
+        self.cancel_analysis()
         selected_file = self.file_var.get()
-        if selected_file and self.current_records and selected_file in self.current_records:
-            records = self.current_records[selected_file]
-            self.display_records(selected_file, records)
+        if selected_file and selected_file in self.current_files:
+            self.display_records(selected_file)
 
             # 如果启用了自动分析，则自动分析数据
-            if self.auto_analyze:
+            if analyze and self.auto_analyze:
                 self.analyze_data()
 
-    def display_records(self, file_type, records):
+    def display_records(self, file_type):
         """显示原始记录"""
         self.display_message("数据分析", f"显示 {file_type} 记录")
 
-    def analyze_data(self):
-        """优化后的数据分析方法"""
+    def analyze_data(self, rebuild=False):
+        """优化后的数据分析方法：使用入库时生成的行，表格已显示该文件时只追加新增的行
+
+        表格显示的是其他文件或其他过滤条件（或 rebuild 为真）时从头填充：第一块结果到达时才清空表格。
+        每块结果在插入前按过滤条件过滤，完成后只更新滚动字幕。
+        """
         selected_date = self.date_var.get()
         selected_file = self.file_var.get()
 
-        if not selected_date or not selected_file or not self.current_records or selected_file not in self.current_records:
+        if not selected_date or not selected_file or selected_file not in self.current_files:
             return
 
-        records = self.current_records[selected_file]
+        # 入库线程只会追加行（或整体替换列表），读取长度即可得到一致的前缀
+        rows = self.file_rows.get((selected_date, selected_file), [])
+        total = len(rows)
+        state = (selected_date, selected_file, self.current_filter()[0])
+        snapshot = self.snapshots.current
+        same_table = state == self.table_state and self.table_rows <= total
+        if (same_table and not rebuild and self.table_rows == total and len(snapshot.synced_rows) == total
+                and (snapshot.date, snapshot.file_type) == (selected_date, selected_file)):
+            return  # 没有新增的行，表格已是最新
+
+        generation = self.cancel_analysis()
+        start = self.table_rows if same_table and not rebuild else 0
+        self.analysis_progress.config(maximum=max(total - start, 1), value=0)
+        self.analysis_pending = True
 
         def do_analysis():
             try:
-                # 在后台线程中解析数据
-                parsed_data = []
-                for line in records:
-                    if not line.strip():
-                        continue
-                    messageType = models.LiveMessageParser.determine_message_type(line)
-                    if messageType == models.LiveMessageParser.MessageType.ARTIFICE:
-                        giftRecord = models.DataAnalyzer.parse_gift_records(line)
-                        if giftRecord:
-                            parsed_data.append((
-                                'gift',
-                                (giftRecord.time, giftRecord.gift_type, giftRecord.user,
-                                 giftRecord.gift, giftRecord.beans, giftRecord.count,
-                                 f"{giftRecord.total:,}", "")
-                            ))
-                    elif messageType == models.LiveMessageParser.MessageType.MULTIPLIER_REWARD:
-                        lotteryRecord = models.DataAnalyzer.parse_lottery_record(line)
-                        if lotteryRecord:
-                            parsed_data.append((
-                                'lottery',
-                                (lotteryRecord.time, lotteryRecord.gift_type, lotteryRecord.user,
-                                 lotteryRecord.gift, lotteryRecord.beans, lotteryRecord.multiple,
-                                 f"{lotteryRecord.beans:,}", "")
-                            ))
-                    elif messageType == models.LiveMessageParser.MessageType.CHAMELEON_LIFE:
-                        eggRecord = models.DataAnalyzer.parse_egg_record(line)
-                        if eggRecord:
-                            parsed_data.append((
-                                'egg',
-                                (eggRecord.time, eggRecord.gift_type, eggRecord.user,
-                                 eggRecord.gift, eggRecord.beans, eggRecord.count,
-                                 f"{eggRecord.beans:,}", f"赠送给 {eggRecord.receiver}")
-                            ))
-
-                # 更新UI
-                def update_ui():
-                    self.result_tree.delete(*self.result_tree.get_children())
-                    for i, (item_type, values) in enumerate(parsed_data):
-                        tags = ('evenrow',) if i % 2 == 0 else ('oddrow',)
-                        self.result_tree.insert("", "end", values=values, tags=tags)
-                    self.result_tree.yview_moveto(1.0)
-                    self.filter_treeview()
-
-                self.safe_ui_update(update_ui)
+                # 至少提交一块（可能为空），从头填充时由它清空表格
+                for i in range(start, total, TABLE_CHUNK_SIZE) or [start]:
+                    if generation != self.analysis_generation:
+                        return
+                    end = min(i + TABLE_CHUNK_SIZE, total)
+                    self.safe_ui_update(self.append_analysis_rows, generation, state, i, rows[i:end], end - start)
+
+                # 全部行追加后发布新的快照版本（期间开始了新的分析时在锁内被拒绝）
+                published = self.snapshots.publish(selected_date, selected_file, rows[:total], generation)
+                if published is None:
+                    return
+                self.safe_ui_update(self.finish_analysis, generation, published)
 
             except Exception as e:
                 print(f"数据分析出错: {e}")
 
         self.thread_pool.submit(do_analysis)
 
+    def cancel_analysis(self):
+        """放弃正在进行的分析（其后续结果会被丢弃），返回新的分析编号"""
+        self.analysis_generation = self.snapshots.new_generation()
+        self.analysis_pending = False
+        return self.analysis_generation
+
+    def append_analysis_rows(self, generation, state, start, rows, done):
+        """把该文件第 start 行起的一块分析结果按过滤条件追加到表格中（在UI线程中执行）"""
+        if generation != self.analysis_generation:
+            return
+        if start == 0:
+            self.result_tree.delete(*self.result_tree.get_children())
+            self.live_items = {}
+            self.analyzed_rows = 0
+            self.table_state = state
+        # 分析被中断时，下次分析从 table_rows 处继续
+        self.table_rows = start + len(rows)
+        filter_items = [item.strip() for item in state[2].split('|')]
+        at_bottom = self.result_tree.yview()[1] >= 1.0
+        for item_type, values in rows:
+            if not self.row_matches(values, filter_items):
+                continue
+            tags = ('evenrow',) if self.analyzed_rows % 2 == 0 else ('oddrow',)
+            self.result_tree.insert("", "end", values=values, tags=tags)
+            self.analyzed_rows += 1
+        self.analysis_progress.config(value=done)
+        if at_bottom:
+            # 只在用户停留在末尾时跟随新行，不打断正在查看的位置
+            self.result_tree.yview_moveto(1.0)
+
+    def finish_analysis(self, generation, snapshot):
+        """分析完成：移除已对账或过期的实时记录，补上分析期间到达的实时记录，再更新滚动字幕"""
+        if generation != self.analysis_generation:
+            return
+        self.analysis_pending = False
+        self.analysis_progress.config(value=self.analysis_progress.cget("maximum"))
+        pending = {live.live_id for live in snapshot.live_rows}
+        for live_id in [live_id for live_id in self.live_items if live_id not in pending]:
+            self.result_tree.delete(self.live_items.pop(live_id))
+        _, filter_items = self.current_filter()
+        at_bottom = self.result_tree.yview()[1] >= 1.0
+        for live in snapshot.live_rows:
+            if live.live_id not in self.live_items and self.row_matches(live.row[1], filter_items):
+                self.insert_live_row(live)
+        if at_bottom:
+            self.result_tree.yview_moveto(1.0)
+        self.refresh_ticker()
+
+    def get_process_pool(self):
+        """首次需要时创建进程池"""
+        if self.process_pool is None:
+            self.process_pool = concurrent.futures.ProcessPoolExecutor()
+        return self.process_pool
+
+    def export_data(self):
+        """把当前选中文件的解析结果导出为 CSV / JSONL / 列式文件"""
+        from tkinter import messagebox, filedialog
+        import exporter
+
+        selected_date = self.date_var.get()
+        selected_file = self.file_var.get()
+        if selected_file not in self.current_files:
+            messagebox.showerror("错误", "请先选择要导出的日期和文件")
+            return
+
+        path = filedialog.asksaveasfilename(
+            initialfile=f"{selected_date}_{selected_file}",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("列式二进制", "*.bhrc")]
+        )
+        if not path:
+            return
+
+        records = self.records_data
+
+        def do_export():
+            try:
+                count = exporter.export_lines(records.lines(selected_date, selected_file), path)
+                self.safe_ui_update(self.display_message, "导出", f"已导出 {count} 条记录到 {path}")
+            except Exception as e:
+                self.safe_ui_update(self.display_message, "导出", f"导出失败: {e}")
+
+        self.thread_pool.submit(do_export)
+
     def show_gift_result(self, giftRecord):
         """显示礼物结果"""
         if giftRecord is not None:
@@ -624,6 +996,7 @@ class WebSocketClientApp:
 
         url = self.server_url.get().strip()
         if not url:
+            from tkinter import messagebox
             messagebox.showerror("错误", "请输入服务器地址")
             return
 
@@ -635,17 +1008,23 @@ class WebSocketClientApp:
         self.thread.start()
 
     def run_client(self, url):
+        # 网络相关模块只在连接时加载
+        import asyncio
+        from autobahn.asyncio.websocket import WebSocketClientFactory
+        from client import MyClientProtocol
+
         self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
 
         # 创建工厂并设置应用引用
         self.factory = WebSocketClientFactory(url)
         self.factory.protocol = MyClientProtocol
+        transport.enable_compression(self.factory)  # 协商 permessage-deflate
         self.factory.app = self  # 将应用实例传递给工厂
 
         try:
             coro = self.loop.create_connection(self.factory, self.factory.host, self.factory.port)
-            transport, protocol = self.loop.run_until_complete(coro)
+            ws_transport, protocol = self.loop.run_until_complete(coro)
 
             # 设置协议的应用引用
             protocol.app = self
@@ -671,6 +1050,7 @@ class WebSocketClientApp:
                 self.protocol.sendMessage(message.encode('utf-8'))
 
         # 创建后台调度器
+        from apscheduler.schedulers.background import BackgroundScheduler
         scheduler = BackgroundScheduler()
         scheduler.add_job(job, 'interval', seconds=10)  # 每10秒执行一次
         scheduler.start()
@@ -683,6 +1063,7 @@ class WebSocketClientApp:
 
     def send_message(self):
         if not self.connected or not self.protocol:
+            from tkinter import messagebox
             messagebox.showerror("错误", "未连接到服务器")
             return
 
@@ -719,7 +1100,10 @@ class WebSocketClientApp:
 
     def on_closing(self):
         """应用关闭时的清理工作"""
+        self.cancel_analysis()
         self.thread_pool.shutdown(wait=False)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
         if self.loop and self.loop.is_running():
             self.loop.call_soon_threadsafe(self.loop.stop())
         self.root.destroy()
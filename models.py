@@ -1,8 +1,11 @@
 import re
+import datetime
 from enum import Enum
 from typing import List, Dict, Pattern
 from collections import defaultdict
 
+from gift_catalog import CATALOG
+
 
 class LiveMessageParser:
     """直播消息解析器，用于提取关键词和识别消息类型"""
@@ -13,7 +16,7 @@ class LiveMessageParser:
     class MessageType(Enum):
         """消息类型枚举（带匹配规则）"""
         ARTIFICE = ".*(触发金火时刻|炼化获得|倍炼化).*"
-        CHAMELEON_LIFE = ".*(插画师|医生|拳击手|机长|超级影帝).*"  #
+        CHAMELEON_LIFE = r".*@\(word:<扭蛋礼物>.*"  # 扭蛋礼物（按消息结构识别，礼物价格见 gifts.json）
         A_DESERT_DREAM = ".*(烛光|花灯|敦煌恋歌|走进敦煌|九色神鹿|舞动敦煌|飞天传说|隐藏款).*"  # 敦煌梦境
         HOLY_SWORDSMAN = ".*(神圣体魄|黄金手套|黄金战靴|黄金头盔|黄金铠甲|圣剑降临).*"  # 圣剑士
         PRIMARY_TREASURE = ".*初级宝藏.*"  # 初级宝藏
@@ -88,21 +91,8 @@ class EggRecord:
 
 
 class DataAnalyzer:
-    GIFT_VALUES = {
-        "神秘人": 38,
-        "插画师": 198,
-        "医生": 688,
-        "拳击手": 2688,
-        "机长": 5688,
-        "超级影帝": 15888,
-        "猴王仙丹": 8888
-    }
-    LUCKY_GIFT_TYPE = {
-        "幸运围棋": 4.0,
-        "幸运卡牌": 12.0,
-        "幸运发财": 36.0,
-        "幸运面具": 100.0
-    }
+    # 礼物价格见 gifts.json
+    CATALOG = CATALOG
 
     @classmethod
     def parse_gift_records(cls, line):
@@ -155,13 +145,13 @@ class DataAnalyzer:
 
             # 计算倍数
             multiple = float(count)
-            REVERSE_GIFT_MAP = {v: k for k, v in cls.LUCKY_GIFT_TYPE.items()}
-            # 计算单倍豆数，并匹配礼物名称
-            single_beans = beans / count
-            gift_name = REVERSE_GIFT_MAP.get(int(single_beans))
+            # 单倍豆数必须能整除才匹配礼物名称
+            gift_name = None
+            if count and beans % count == 0:
+                gift_name = cls.CATALOG.lucky_gift(beans // count)
             # 如果未匹配到礼物，默认返回单倍豆数
             if not gift_name:
-                gift_name = f"{single_beans}豆/倍"
+                gift_name = f"{beans / count if count else 0}豆/倍"
             return LotteryRecord(
                 time=time,
                 user=user.strip(),
@@ -177,7 +167,7 @@ class DataAnalyzer:
         match = re.match(pattern, eggRecord)
         if match:
             time, user, receiver, count, gift = match.groups()
-            beans = cls.GIFT_VALUES.get(gift.strip(), 0)
+            beans = cls.CATALOG.gift_beans(gift.strip())
             return EggRecord(
                 time=time,
                 user=user,
@@ -187,3 +177,75 @@ class DataAnalyzer:
                 beans=beans,
                 gift_type='扭蛋礼物'
             )
+
+    @classmethod
+    def parse_line(cls, line, message_type=None):
+        """按消息类型分派解析单行记录，无法识别时返回 None"""
+        if not line.strip():
+            return None
+        if message_type is None:
+            message_type = LiveMessageParser.determine_message_type(line)
+        if message_type == LiveMessageParser.MessageType.ARTIFICE:
+            return cls.parse_gift_records(line)
+        elif message_type == LiveMessageParser.MessageType.MULTIPLIER_REWARD:
+            return cls.parse_lottery_record(line)
+        elif message_type == LiveMessageParser.MessageType.CHAMELEON_LIFE:
+            return cls.parse_egg_record(line)
+        return None
+
+    @classmethod
+    def parse_batch(cls, lines):
+        """把一批原始行解析为 [(消息类型, 时间戳, 记录), ...]，跳过空行；记录无法识别时为 None
+
+        可在子进程中调用。
+        """
+        cls.CATALOG.reload_if_changed()
+        parsed = []
+        for line in lines:
+            if not line.strip():
+                continue
+            message_type = LiveMessageParser.determine_message_type(line)
+            parsed.append((message_type, parse_record_time(line), cls.parse_line(line, message_type)))
+        return parsed
+
+    @staticmethod
+    def record_to_row(record):
+        """记录 -> (记录类型, 分析表格列值)，不是可显示的记录时返回 None"""
+        if isinstance(record, GiftRecord):
+            return ('gift', (record.time, record.gift_type, record.user, record.gift,
+                             record.beans, record.count, f"{record.total:,}", ""))
+        elif isinstance(record, LotteryRecord):
+            return ('lottery', (record.time, record.gift_type, record.user, record.gift,
+                                record.beans, record.multiple, f"{record.beans:,}", ""))
+        elif isinstance(record, EggRecord):
+            return ('egg', (record.time, record.gift_type, record.user, record.gift,
+                            record.beans, record.count, f"{record.beans:,}", f"赠送给 {record.receiver}"))
+        return None
+
+
+def parse_record_time(time_str):
+    """把 "2025年01月02日 21:10:11(.123)" 转换为时间戳（本地时间），也可直接传入整行记录"""
+    try:
+        dt = datetime.datetime(int(time_str[0:4]), int(time_str[5:7]), int(time_str[8:10]),
+                               int(time_str[12:14]), int(time_str[15:17]), int(time_str[18:20]))
+    except (ValueError, IndexError):
+        return None
+    timestamp = dt.timestamp()
+    if time_str[20:21] == '.':
+        # 毫秒部分，允许后面紧跟消息正文
+        digits = time_str[21:].split(' ', 1)[0]
+        if digits.isdigit():
+            timestamp += float('0.' + digits)
+    return timestamp
+
+
+def record_value(record):
+    """记录对应的豆数价值"""
+    if isinstance(record, GiftRecord):
+        return record.total
+    elif isinstance(record, LotteryRecord):
+        return record.beans
+    elif isinstance(record, EggRecord):
+        return record.beans * int(record.count)
+    return 0
+
@@ -0,0 +1,88 @@
+import itertools
+import threading
+from collections import defaultdict, deque
+
+import models
+
+
+class RecordStore:
+    """记录入库：把解析结果分发给各统计模块，并让同步数据与实时消息对账，避免重复计数
+
+    同一条记录（类型、用户、礼物、豆数价值相同，时间相差不超过 tolerance 秒）可能先后经实时消息
+    （msgType 233）和同步数据到达，顺序不定：先到的一方分发并留下对账记录，后到的一方只做对账。
+    这里是唯一的对账实现：分析表格中的实时记录行按这里返回的实时记录编号移除。
+    """
+
+    def __init__(self, tolerance=60.0, pending_ttl=600.0):
+        self.tolerance = tolerance
+        self.pending_ttl = pending_ttl  # 对账记录的保留时间
+        self._sinks = []
+        self._lock = threading.Lock()
+        self._live_ids = itertools.count(1)
+        self._live = defaultdict(deque)  # 对账键 -> 尚未被同步数据对账的 (时间戳, 实时记录编号)
+        self._synced = defaultdict(deque)  # 对账键 -> 尚未被实时消息对账的 (时间戳, None)
+
+    def add_sink(self, sink):
+        """注册接收者 sink(message_type, timestamp, record)，record 可能为 None"""
+        self._sinks.append(sink)
+
+    @staticmethod
+    def reconcile_key(record):
+        """对账键：(记录类型, 用户, 礼物, 豆数价值)；扭蛋礼物的价值包含个数"""
+        return type(record).__name__, record.user, record.gift, models.record_value(record)
+
+    def _emit(self, message_type, timestamp, record):
+        for sink in self._sinks:
+            sink(message_type, timestamp, record)
+
+    def _take_match(self, entries, key, timestamp):
+        """从 entries[key] 中取走一条时间相近的记录并返回，没有时返回 None"""
+        pending = entries.get(key)
+        if not pending:
+            return None
+        matched = next((entry for entry in pending if abs(entry[0] - timestamp) <= self.tolerance), None)
+        if matched is None:
+            return None
+        pending.remove(matched)
+        if not pending:
+            del entries[key]
+        return matched
+
+    def add_live(self, message_type, timestamp, record):
+        """实时消息解析出的记录，同步数据中尚无该记录时立即分发；返回实时记录编号，已同步过时返回 None"""
+        key = self.reconcile_key(record)
+        with self._lock:
+            if self._take_match(self._synced, key, timestamp):
+                return None
+            live_id = next(self._live_ids)
+            self._live[key].append((timestamp, live_id))
+        self._emit(message_type, timestamp, record)
+        return live_id
+
+    def add_synced(self, message_type, timestamp, record):
+        """同步数据中的记录，已由实时消息入库的只做对账；返回被对账的实时记录编号，没有时返回 None"""
+        if record is not None and timestamp is not None:
+            key = self.reconcile_key(record)
+            with self._lock:
+                matched = self._take_match(self._live, key, timestamp)
+                if matched:
+                    return matched[1]
+                self._synced[key].append((timestamp, None))
+        self._emit(message_type, timestamp, record)
+        return None
+
+    def expire(self, now):
+        """丢弃超过保留时间仍未对账的记录，返回其中实时记录的编号"""
+        cutoff = now - self.pending_ttl
+        expired = []
+        with self._lock:
+            for entries in (self._live, self._synced):
+                for key in list(entries):
+                    pending = entries[key]
+                    while pending and pending[0][0] < cutoff:
+                        _, live_id = pending.popleft()
+                        if live_id is not None:
+                            expired.append(live_id)
+                    if not pending:
+                        del entries[key]
+        return expired
@@ -0,0 +1,99 @@
+import threading
+from array import array
+from bisect import bisect_right
+
+import models
+
+MessageType = models.LiveMessageParser.MessageType
+
+
+class MinuteRollup:
+    """按分钟汇总各消息类型的豆数、事件数和倍数分布，数据保存在定长环形数组中"""
+
+    # 倍数分布的区间下界：[1,2) [2,5) ... [1000, ∞)
+    MULTIPLE_BUCKETS = (1, 2, 5, 10, 50, 100, 500, 1000)
+    DEFAULT_CAPACITY = 7 * 24 * 60  # 默认保留7天
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        bins = len(self.MULTIPLE_BUCKETS)
+        self._minutes = {}
+        self._beans = {}
+        self._counts = {}
+        self._histograms = {}
+        for message_type in MessageType:
+            self._minutes[message_type] = array('q', [-1]) * capacity  # 槽位对应的分钟编号
+            self._beans[message_type] = array('q', [0]) * capacity
+            self._counts[message_type] = array('l', [0]) * capacity
+            self._histograms[message_type] = array('l', [0]) * (capacity * bins)
+
+    def _slot(self, message_type, minute):
+        """取得分钟对应的槽位，槽位被更早的分钟占用时先清零"""
+        slot = minute % self.capacity
+        minutes = self._minutes[message_type]
+        if minutes[slot] != minute:
+            if minutes[slot] > minute:
+                return None  # 已超出保留范围的旧数据
+            minutes[slot] = minute
+            self._beans[message_type][slot] = 0
+            self._counts[message_type][slot] = 0
+            bins = len(self.MULTIPLE_BUCKETS)
+            histogram = self._histograms[message_type]
+            for i in range(slot * bins, slot * bins + bins):
+                histogram[i] = 0
+        return slot
+
+    def add(self, message_type, timestamp, beans=0, multiple=None):
+        """记录一个事件"""
+        minute = int(timestamp // 60)
+        with self._lock:
+            slot = self._slot(message_type, minute)
+            if slot is None:
+                return
+            self._beans[message_type][slot] += beans
+            self._counts[message_type][slot] += 1
+            if multiple is not None:
+                bucket = max(bisect_right(self.MULTIPLE_BUCKETS, multiple) - 1, 0)
+                self._histograms[message_type][slot * len(self.MULTIPLE_BUCKETS) + bucket] += 1
+
+    def add_record(self, message_type, timestamp, record):
+        """记录一条解析结果（record 可为 None，只计事件数）"""
+        if record is None:
+            self.add(message_type, timestamp)
+        else:
+            self.add(message_type, timestamp, models.record_value(record), getattr(record, 'multiple', None))
+
+    def _minute_range(self, start, end):
+        first = int(start // 60)
+        last = int(end // 60)
+        return range(max(first, last - self.capacity + 1), last + 1)
+
+    def series(self, message_type, start, end):
+        """返回 [(分钟起始时间戳, 豆数, 事件数), ...]，没有数据的分钟记为0"""
+        result = []
+        minutes = self._minutes[message_type]
+        beans = self._beans[message_type]
+        counts = self._counts[message_type]
+        with self._lock:
+            for minute in self._minute_range(start, end):
+                slot = minute % self.capacity
+                if minutes[slot] == minute:
+                    result.append((minute * 60, beans[slot], counts[slot]))
+                else:
+                    result.append((minute * 60, 0, 0))
+        return result
+
+    def histogram(self, message_type, start, end):
+        """返回时间范围内各倍数区间的事件数"""
+        bins = len(self.MULTIPLE_BUCKETS)
+        result = [0] * bins
+        minutes = self._minutes[message_type]
+        histogram = self._histograms[message_type]
+        with self._lock:
+            for minute in self._minute_range(start, end):
+                slot = minute % self.capacity
+                if minutes[slot] == minute:
+                    for i in range(bins):
+                        result[i] += histogram[slot * bins + i]
+        return result
@@ -0,0 +1,77 @@
+import threading
+from collections import namedtuple
+
+# 尚未被同步数据对账的实时记录行（live_id 由 RecordStore 分配）
+LiveRow = namedtuple("LiveRow", ["live_id", "row"])
+
+
+class RecordSnapshot(namedtuple("RecordSnapshot", ["version", "date", "file_type", "synced_rows", "live_rows"])):
+    """不可变的分析结果快照：synced_rows 为同步数据解析出的 ((记录类型, 列值), ...)，
+    live_rows 为尚未出现在同步数据中的实时记录"""
+    __slots__ = ()
+
+    @property
+    def rows(self):
+        return self.synced_rows + tuple(live.row for live in self.live_rows)
+
+
+class SnapshotStore:
+    """分析结果的版本化快照
+
+    写入方（后台线程）每次发布一个新的不可变版本（写时复制）；读取方直接读取 current，
+    无需加锁即可得到一致的数据，并可凭版本号判断自己的计算结果是否已过期。
+    实时记录在被 RecordStore 对账或过期前会合并进该文件的每个新版本。
+    写入方发布前须先用 new_generation() 取得编号，编号已过期的发布会在锁内被拒绝。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # 只在写入方之间互斥
+        self._live = {}  # (日期, 文件) -> [LiveRow, ...]
+        self.generation = 0  # 最新的写入编号
+        self.current = RecordSnapshot(0, "", "", (), ())
+
+    def new_generation(self):
+        """开始新的写入，之前取得的编号随之过期，返回新编号"""
+        with self._lock:
+            self.generation += 1
+            return self.generation
+
+    def publish(self, date, file_type, rows, generation):
+        """发布同步数据的解析结果并返回新快照；generation 已过期时不发布，返回 None"""
+        rows = tuple(rows)
+        with self._lock:
+            if generation != self.generation:
+                return None
+            live_rows = tuple(self._live.get((date, file_type), ()))
+            snapshot = RecordSnapshot(self.current.version + 1, date, file_type, rows, live_rows)
+            self.current = snapshot
+            return snapshot
+
+    def add_live(self, date, file_type, live_id, row):
+        """记录一条实时记录行，返回 (LiveRow, 新快照)；当前快照不是该文件时新快照为 None"""
+        with self._lock:
+            live = LiveRow(live_id, row)
+            self._live.setdefault((date, file_type), []).append(live)
+            base = self.current
+            if (base.date, base.file_type) != (date, file_type):
+                return live, None
+            snapshot = base._replace(version=base.version + 1, live_rows=base.live_rows + (live,))
+            self.current = snapshot
+            return live, snapshot
+
+    def remove_live(self, live_ids):
+        """移除已被对账或已过期的实时记录（所有文件），当前快照包含它们时发布新版本"""
+        live_ids = set(live_ids)
+        if not live_ids:
+            return
+        with self._lock:
+            for key in list(self._live):
+                remaining = [live for live in self._live[key] if live.live_id not in live_ids]
+                if remaining:
+                    self._live[key] = remaining
+                else:
+                    del self._live[key]
+            base = self.current
+            live_rows = tuple(live for live in base.live_rows if live.live_id not in live_ids)
+            if len(live_rows) != len(base.live_rows):
+                self.current = base._replace(version=base.version + 1, live_rows=live_rows)
@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: E402
+from alerts import AlertEngine, AlertQueue, AlertRule, load_rules  # noqa: E402
+
+TIME = "2025年06月01日 21:10:11"
+T0 = models.parse_record_time(TIME)
+
+
+def lottery(user, multiple, time=TIME):
+    return models.LotteryRecord(time, user, "幸运面具", multiple, multiple * 100, gift_type="幸运礼物")
+
+
+def make_engine(cooldown=30):
+    rule = AlertRule("大倍数", "multiple", 500, gift_type="幸运礼物", cooldown=cooldown, template="{user} {multiple}")
+    return AlertEngine([rule])
+
+
+def test_threshold_and_cooldown_per_user():
+    engine = make_engine()
+    assert engine.evaluate(lottery("张三", 100), T0, now=T0) == []
+    assert [text for _, text in engine.evaluate(lottery("张三", 500), T0, now=T0)] == ["张三 500"]
+    # 冷却期内同一用户的另一条记录不提醒，其他用户不受影响
+    assert engine.evaluate(lottery("张三", 800, "2025年06月01日 21:10:20"), T0 + 9, now=T0 + 10) == []
+    assert len(engine.evaluate(lottery("李四", 800), T0, now=T0 + 10)) == 1
+    assert len(engine.evaluate(lottery("张三", 900, "2025年06月01日 21:10:50"), T0 + 39, now=T0 + 40)) == 1
+
+
+def test_same_record_fires_once():
+    engine = make_engine(cooldown=0)
+    record = lottery("张三", 500)
+    assert len(engine.evaluate(record, T0, now=T0)) == 1
+    # 同一记录经实时消息和同步数据各到达一次，只提醒一次
+    assert engine.evaluate(lottery("张三", 500), T0, now=T0 + 5) == []
+
+
+def test_old_records_and_other_gift_types_are_ignored():
+    engine = make_engine()
+    assert engine.evaluate(lottery("张三", 1000), T0, now=T0 + engine.max_age + 1) == []
+    record = models.GiftRecord(TIME, "张三", "烈焰", 100, 1, 1000.0, gift_type="炼化礼物")
+    assert engine.evaluate(record, T0, now=T0) == []
+
+
+def test_load_rules_skips_bad_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{"name": "缺少字段", "min": 1}, {"name": "好", "field": "value", "min": 1}]),
+                    encoding='utf8')
+    assert [rule.name for rule in load_rules(str(path))] == ["好"]
+    path.write_text("[{", encoding='utf8')
+    assert load_rules(str(path)) == []
+    assert load_rules(str(tmp_path / "missing.json")) == []
+
+
+class Recorder:
+    """记录显示过的提醒；第一条提醒显示时阻塞，便于在队列中积压提醒"""
+
+    def __init__(self):
+        self.shown = []
+        self.restored = threading.Event()
+        self.blocking = threading.Event()
+        self.release = threading.Event()
+
+    def show(self, text):
+        self.shown.append(text)
+        if len(self.shown) == 1:
+            self.blocking.set()
+            self.release.wait(5)
+
+    def restore(self):
+        self.restored.set()
+
+
+def test_queue_evicts_lowest_priority_when_full():
+    recorder = Recorder()
+    alerts = AlertQueue(recorder.show, recorder.restore, hold=0, ttl=30, max_size=2)
+    alerts.push(0, "first")
+    assert recorder.blocking.wait(5)
+    alerts.push(1, "low")
+    alerts.push(5, "high")
+    alerts.push(1, "low-late")  # 队列已满，同优先级中最晚入队的被丢弃
+    assert alerts.active
+    recorder.release.set()
+    assert recorder.restored.wait(5)
+    assert recorder.shown == ["first", "high", "low"]
+    assert not alerts.active
+
+
+def test_queue_drops_expired_alerts():
+    recorder = Recorder()
+    alerts = AlertQueue(recorder.show, recorder.restore, hold=0, ttl=0.05)
+    alerts.push(0, "first")
+    assert recorder.blocking.wait(5)
+    alerts.push(9, "stale")
+    time.sleep(0.1)
+    recorder.release.set()
+    assert recorder.restored.wait(5)
+    assert recorder.shown == ["first"]
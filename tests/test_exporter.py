@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+import exporter  # noqa: E402
+
+LINES = [
+    "2025年06月01日 21:10:11.123 恭喜@(word:张三)触发@(word:100)倍，获得@(word:10000)豆\n",
+    "无法识别的行\n",
+    "",
+    "2025年06月01日 21:10:12 恭喜@(word:李四)触发@(word:5)倍，获得@(word:60)豆",
+]
+
+
+def test_columnar_round_trip(tmp_path):
+    path = str(tmp_path / "records.bhrc")
+    assert exporter.export_lines(LINES, path, chunk_size=1) == 2
+    with open(path, 'rb') as f:
+        groups = list(exporter.read_columnar(f))
+
+    # chunk_size=1 时每条记录一个行组
+    assert len(groups) == 2
+    columns = {name: [value for group in groups for value in group[name]] for name in exporter.COLUMN_NAMES}
+    assert columns["time"] == ["2025年06月01日 21:10:11.123", "2025年06月01日 21:10:12"]
+    assert columns["user"] == ["张三", "李四"]
+    assert columns["gift"] == ["幸运面具", "幸运卡牌"]
+    assert columns["multiple"] == [100.0, 5.0]
+    assert columns["total"] == [10000, 60]
+    assert columns["timestamp"][1] - columns["timestamp"][0] == pytest.approx(0.877)
+
+
+def test_empty_export_is_readable(tmp_path):
+    path = str(tmp_path / "empty.bhrc")
+    assert exporter.export_lines([], path) == 0
+    with open(path, 'rb') as f:
+        assert list(exporter.read_columnar(f)) == []
@@ -0,0 +1,33 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: E402
+from gift_catalog import GiftCatalog  # noqa: E402
+
+EGG_LINE = "2025年06月01日 21:10:11 @(word:张三) 送 @(word:主播) @(word:2) 个 @(word:<扭蛋礼物>{})，感谢支持"
+
+
+def test_broken_file_starts_empty_and_recovers(tmp_path):
+    path = tmp_path / "gifts.json"
+    path.write_text("{", encoding='utf8')
+    catalog = GiftCatalog(str(path))
+    assert catalog.error
+    assert catalog.gift_beans("医生") == 0
+
+    path.write_text(json.dumps({"gifts": {"医生": 688}, "lucky_gifts": {"幸运面具": 100}}), encoding='utf8')
+    os.utime(path, (1, 1))
+    assert catalog.reload_if_changed()
+    assert catalog.error is None
+    assert catalog.gift_beans("医生") == 688
+    assert catalog.lucky_gift(100) == "幸运面具"
+
+
+def test_capsule_gifts_are_recognised_by_structure():
+    # 不在固定名单中的扭蛋礼物只需写入 gifts.json
+    line = EGG_LINE.format("猴王仙丹")
+    assert models.LiveMessageParser.determine_message_type(line) == models.LiveMessageParser.MessageType.CHAMELEON_LIFE
+    record = models.DataAnalyzer.parse_line(line)
+    assert (record.gift, record.beans, record.count) == ("猴王仙丹", models.CATALOG.gift_beans("猴王仙丹"), "2")
@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: E402
+from leaderboard import RollingLeaderboard  # noqa: E402
+
+TIME = "2025年06月01日 21:10:11"
+T0 = models.parse_record_time(TIME)
+
+
+def lottery(user, beans, time=TIME):
+    return models.LotteryRecord(time, user, "幸运面具", 10, beans, gift_type="幸运礼物")
+
+
+def test_window_totals_and_expiry():
+    board = RollingLeaderboard({"1分钟": 60, "1小时": 3600})
+    board.add(lottery("张三", 1000), now=T0)
+    board.add(lottery("李四", 3000), now=T0)
+    board.add(lottery("张三", 500), now=T0)
+    assert board.top("1分钟", "user", now=T0 + 30) == [("李四", 3000, 1), ("张三", 1500, 2)]
+    assert board.top("1分钟", "gift_type", now=T0 + 30) == [("幸运礼物", 4500, 3)]
+
+    # 超出1分钟窗口后只在1小时窗口中保留
+    assert board.top("1分钟", "user", now=T0 + 61) == []
+    assert board.top("1小时", "user", now=T0 + 61) == [("李四", 3000, 1), ("张三", 1500, 2)]
+
+
+def test_records_older_than_window_are_ignored():
+    board = RollingLeaderboard({"1分钟": 60})
+    board.add(lottery("张三", 1000), now=T0 + 120)
+    assert board.top("1分钟", "user", now=T0 + 120) == []
+    assert board.format_text("1分钟", "user", now=T0 + 120) == ""
@@ -0,0 +1,87 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: E402
+from record_store import RecordStore  # noqa: E402
+from snapshot import SnapshotStore  # noqa: E402
+
+TIME = "2025年06月01日 21:10:11"
+T0 = models.parse_record_time(TIME)
+LOTTERY = models.LiveMessageParser.MessageType.MULTIPLIER_REWARD
+EGG = models.LiveMessageParser.MessageType.CHAMELEON_LIFE
+
+
+def lottery(user="张三", beans=3600):
+    return models.LotteryRecord(TIME, user, "幸运面具", 36, beans, gift_type="幸运礼物")
+
+
+def egg(count):
+    return models.EggRecord(TIME, "张三", "主播", str(count), "医生", 688, gift_type="扭蛋礼物")
+
+
+def make_store():
+    store = RecordStore(tolerance=60, pending_ttl=600)
+    emitted = []
+    store.add_sink(lambda message_type, timestamp, record: emitted.append(record))
+    return store, emitted
+
+
+def test_live_then_synced():
+    store, emitted = make_store()
+    live_id = store.add_live(LOTTERY, T0, lottery())
+    assert live_id is not None
+    # 同步数据中的同一条记录（时间在容差内）只做对账，并返回实时记录编号
+    assert store.add_synced(LOTTERY, T0 + 2, lottery()) == live_id
+    assert len(emitted) == 1
+    # 之后的另一条相同记录是新记录
+    assert store.add_synced(LOTTERY, T0 + 5, lottery()) is None
+    assert len(emitted) == 2
+
+
+def test_synced_then_live():
+    store, emitted = make_store()
+    assert store.add_synced(LOTTERY, T0, lottery()) is None
+    assert store.add_live(LOTTERY, T0 + 2, lottery()) is None
+    assert len(emitted) == 1
+    assert store.add_live(LOTTERY, T0 + 3, lottery()) is not None
+    assert len(emitted) == 2
+
+
+def test_key_includes_value_and_time_tolerance():
+    store, emitted = make_store()
+    store.add_live(EGG, T0, egg(1))
+    # 扭蛋个数不同（价值不同）的记录不会被对账
+    assert store.add_synced(EGG, T0, egg(2)) is None
+    # 超出时间容差的记录不会被对账
+    assert store.add_synced(EGG, T0 + 61, egg(1)) is None
+    assert len(emitted) == 3
+
+
+def test_expire_returns_unreconciled_live_ids():
+    store, _ = make_store()
+    old_id = store.add_live(LOTTERY, T0, lottery("张三"))
+    new_id = store.add_live(LOTTERY, T0 + 500, lottery("李四"))
+    store.add_synced(LOTTERY, T0, lottery("王五"))
+    assert store.expire(T0 + 601) == [old_id]
+    assert store.add_synced(LOTTERY, T0 + 500, lottery("李四")) == new_id
+    # 过期的同步记录不再拦截实时记录
+    assert store.add_live(LOTTERY, T0, lottery("王五")) is not None
+
+
+def test_snapshot_drops_reconciled_live_rows_for_every_file():
+    snapshots = SnapshotStore()
+    generation = snapshots.new_generation()
+    snapshots.publish("d", "a", [("lottery", ("t",))], generation)
+    shown, snapshot = snapshots.add_live("d", "a", 1, ("lottery", ("live-a",)))
+    assert snapshot.live_rows == (shown,)
+    _, snapshot = snapshots.add_live("d", "b", 2, ("lottery", ("live-b",)))
+    assert snapshot is None
+
+    snapshots.remove_live([1, 2])
+    assert snapshots.current.live_rows == ()
+    assert snapshots.current.version == 3
+    # 另一个文件的实时记录也已移除，不会在发布时再出现
+    snapshots.publish("d", "b", [], generation)
+    assert snapshots.current.live_rows == ()
@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rollup import MessageType, MinuteRollup  # noqa: E402
+
+LOTTERY = MessageType.MULTIPLIER_REWARD
+MINUTE = 29000000  # 任意分钟编号
+T0 = MINUTE * 60
+
+
+def test_series_and_histogram():
+    rollup = MinuteRollup(capacity=10)
+    rollup.add(LOTTERY, T0 + 5, beans=100, multiple=1)
+    rollup.add(LOTTERY, T0 + 50, beans=300, multiple=500)
+    rollup.add(LOTTERY, T0 + 65, beans=40, multiple=4)
+    assert rollup.series(LOTTERY, T0, T0 + 60 * 2) == [(T0, 400, 2), (T0 + 60, 40, 1), (T0 + 120, 0, 0)]
+    assert rollup.histogram(LOTTERY, T0, T0 + 60) == [1, 1, 0, 0, 0, 0, 1, 0]
+
+
+def test_ring_wraps_and_rejects_stale_minutes():
+    rollup = MinuteRollup(capacity=3)
+    rollup.add(LOTTERY, T0, beans=100)
+    # 3分钟后的数据占用同一槽位，旧数据被清零
+    rollup.add(LOTTERY, T0 + 3 * 60, beans=7)
+    assert rollup.series(LOTTERY, T0 + 3 * 60, T0 + 3 * 60) == [(T0 + 3 * 60, 7, 1)]
+    assert rollup.series(LOTTERY, T0, T0) == [(T0, 0, 0)]
+
+    # 已超出保留范围的分钟被丢弃，不会覆盖新数据
+    rollup.add(LOTTERY, T0 + 10, beans=100)
+    assert rollup.series(LOTTERY, T0 + 3 * 60, T0 + 3 * 60) == [(T0 + 3 * 60, 7, 1)]
+    # 查询范围超过容量时只返回保留的分钟
+    assert len(rollup.series(LOTTERY, T0, T0 + 3 * 60)) == 3
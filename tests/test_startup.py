@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+pytest.importorskip("tkinter")
+
+import main  # noqa: E402
+
+# 只应在首次使用时加载的模块
+LAZY_MODULES = ("requests", "autobahn", "txaio", "apscheduler")
+
+
+def import_profile():
+    """在子进程中用 -X importtime 导入 main，返回 {模块名: 累计耗时(微秒)}"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def test_heavy_modules_not_imported_at_startup():
+    profile = import_profile()
+    loaded = {name.split(".")[0] for name in profile}
+    assert not loaded & set(LAZY_MODULES)
+
+
+def test_import_within_startup_budget():
+    profile = import_profile()
+    assert profile["main"] / 1e6 <= main.STARTUP_BUDGET
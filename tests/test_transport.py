@@ -0,0 +1,89 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+import transport  # noqa: E402
+
+RECORDS = {
+    "2025-06-01": {
+        "幸运礼物": [
+            "2025年06月01日 21:10:11.123 恭喜@(word:张三)触发@(word:100)倍，获得@(word:3600)豆",
+            "2025年06月01日 21:10:12 恭喜@(word:😀玩家)触发@(word:5)倍，获得@(word:60)豆",
+            "",
+        ],
+        "空文件": [],
+    },
+    "2025-06-02": {},
+    "2025-06-03": {
+        "多行": ["第一行\n第二行", "", "ascii only"],
+    },
+}
+
+
+def sync_records(message):
+    assert message["msgType"] == transport.SYNC_MSG_TYPE
+    assert message["msgExtra"]["msgType"] == "lotteryRecords"
+    return message["msgExtra"]["msgExtra"]
+
+
+def as_dict(records):
+    return {date: {file_type: records.lines(date, file_type) for file_type in records.files(date)}
+            for date in records.dates()}
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_sync_records_round_trip(compress):
+    payload = transport.encode_sync_records(RECORDS, compress=compress)
+    magic = transport.MAGIC_COMPRESSED if compress else transport.MAGIC_RECORDS
+    assert payload.startswith(magic)
+    assert sync_records(transport.decode_binary_message(payload)) == RECORDS
+
+
+def test_empty_sync_round_trip():
+    payload = transport.encode_sync_records({})
+    assert sync_records(transport.decode_binary_message(payload)) == {}
+
+
+@pytest.mark.parametrize("prefix", [b"", b"  \r\n\t", b"\xef\xbb\xbf", b"\xef\xbb\xbf \n"])
+def test_binary_json_with_whitespace_or_bom(prefix):
+    payload = prefix + '{"msgType": 233, "msgExtra": "恭喜"}'.encode('utf8')
+    assert transport.decode_binary_message(payload) == {"msgType": 233, "msgExtra": "恭喜"}
+
+
+@pytest.mark.parametrize("extra", [
+    {"msgType": "lotteryRecords", "msgExtra": RECORDS},
+    {"msgExtra": RECORDS, "msgType": "lotteryRecords"},
+])
+@pytest.mark.parametrize("outer_first", [True, False])
+def test_lazy_envelope_sync_records(extra, outer_first):
+    members = [("msgType", transport.SYNC_MSG_TYPE), ("msgExtra", extra)]
+    if not outer_first:
+        members.reverse()
+    envelope = transport.LazyEnvelope(json.dumps(dict(members), ensure_ascii=False))
+    assert envelope.msg_type == transport.SYNC_MSG_TYPE
+    assert envelope.inner_type() == "lotteryRecords"
+    assert as_dict(envelope.records()) == RECORDS
+
+
+
+def test_lazy_sync_records_decode_one_file_at_a_time():
+    text = json.dumps({"msgType": 1995, "msgExtra": {"msgType": "lotteryRecords", "msgExtra": RECORDS}},
+                      ensure_ascii=False)
+    records = transport.LazyEnvelope(text).records()
+    assert isinstance(records, transport.LazySyncRecords)
+    items = records.items()
+    assert next(items) == ("2025-06-01", "幸运礼物", RECORDS["2025-06-01"]["幸运礼物"])
+    assert [(date, file_type) for date, file_type, _ in items] == [("2025-06-01", "空文件"), ("2025-06-03", "多行")]
+    # 遍历后可单独解码任一文件
+    assert records.lines("2025-06-03", "多行") == RECORDS["2025-06-03"]["多行"]
+    assert records.files("2025-06-02") == []
+
+
+def test_lazy_envelope_defers_msg_extra():
+    envelope = transport.LazyEnvelope('{"msgType": 1995, "msgExtra": {"msgType": "other", "msgExtra": [')
+    assert envelope.msg_type == transport.SYNC_MSG_TYPE
+    assert envelope.inner_type() == "other"
@@ -0,0 +1,340 @@
+import json
+import re
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+
+# 长度前缀格式的同步数据：MAGIC_RECORDS 为原始内容，MAGIC_COMPRESSED 为 zlib 压缩后的内容
+MAGIC_RECORDS = b"BHRL"
+MAGIC_COMPRESSED = b"BHRZ"
+
+# 每个文件的行分隔方式
+SPLIT_NEWLINE = 0
+SPLIT_LENGTHS = 1
+
+SYNC_MSG_TYPE = 1995
+
+# 文本帧达到该长度（字符）时才按需解码；小帧直接 json.loads 更快
+LAZY_ENVELOPE_MIN_SIZE = 64 * 1024
+
+
+def encode_sync_records(records, compress=True):
+    """把 {日期: {文件: [行, ...]}} 编码为长度前缀的二进制同步数据（供服务端或测试使用）
+
+    内容结构：u32 日期数，每个日期: u16 长度 + 日期, u32 文件数，
+    每个文件: u16 长度 + 文件名, u32 行数, u8 分隔方式,
+        分隔方式 0（各行都不含换行符）: u32 字节数 + 以换行符连接的 UTF-8 内容
+        分隔方式 1: 行数个 u32 字符长度, u32 字节数 + 所有行直接拼接的 UTF-8 内容
+    """
+    chunks = [struct.pack("<I", len(records))]
+    for date, files in records.items():
+        encoded = date.encode('utf8')
+        chunks.append(struct.pack("<H", len(encoded)) + encoded + struct.pack("<I", len(files)))
+        for file_type, lines in files.items():
+            encoded = file_type.encode('utf8')
+            chunks.append(struct.pack("<H", len(encoded)) + encoded + struct.pack("<I", len(lines)))
+            if not any("\n" in line for line in lines):
+                # 常见情况：按换行符切分即可还原，解码最快
+                text = "\n".join(lines).encode('utf8')
+                chunks.append(struct.pack("<BI", SPLIT_NEWLINE, len(text)))
+            else:
+                lengths = array('I', map(len, lines))
+                if sys.byteorder == 'big':
+                    lengths.byteswap()
+                text = "".join(lines).encode('utf8')
+                chunks.append(struct.pack("<B", SPLIT_LENGTHS))
+                chunks.append(lengths.tobytes())
+                chunks.append(struct.pack("<I", len(text)))
+            chunks.append(text)
+    body = b"".join(chunks)
+    if compress:
+        return MAGIC_COMPRESSED + zlib.compress(body)
+    return MAGIC_RECORDS + body
+
+
+def decode_sync_records(body):
+    """解码长度前缀的同步数据内容（不含 MAGIC）
+
+    每个文件的内容只解码一次，再按换行符或字符长度切分出各行。
+    """
+    view = memoryview(body)
+    pos = 0
+
+    def read_count():
+        nonlocal pos
+        count, = struct.unpack_from("<I", view, pos)
+        pos += 4
+        return count
+
+    def read_name():
+        nonlocal pos
+        size, = struct.unpack_from("<H", view, pos)
+        pos += 2
+        value = str(view[pos:pos + size], 'utf8')
+        pos += size
+        return value
+
+    records = {}
+    for _ in range(read_count()):
+        date = read_name()
+        files = records[date] = {}
+        for _ in range(read_count()):
+            file_type = read_name()
+            line_count = read_count()
+            split_mode = view[pos]
+            pos += 1
+            if split_mode == SPLIT_NEWLINE:
+                size = read_count()
+                text = str(view[pos:pos + size], 'utf8')
+                pos += size
+                files[file_type] = text.split("\n") if line_count else []
+                continue
+            if split_mode != SPLIT_LENGTHS:
+                raise ValueError(f"未知的分隔方式: {split_mode}")
+            lengths = array('I')
+            lengths.frombytes(view[pos:pos + line_count * 4])
+            if sys.byteorder == 'big':
+                lengths.byteswap()
+            pos += line_count * 4
+            size = read_count()
+            text = str(view[pos:pos + size], 'utf8')
+            pos += size
+            ends = list(accumulate(lengths))
+            files[file_type] = [text[start:end] for start, end in zip([0] + ends, ends)]
+    return records
+
+
+def decode_binary_message(payload):
+    """把二进制帧解码为与JSON文本帧相同结构的消息字典
+
+    支持长度前缀的同步数据（可压缩）、MessagePack（需安装 msgpack）以及二进制形式的JSON。
+    """
+    magic = payload[:4]
+    if magic == MAGIC_COMPRESSED:
+        records = decode_sync_records(zlib.decompress(payload[4:]))
+    elif magic == MAGIC_RECORDS:
+        records = decode_sync_records(payload[4:])
+    else:
+        # 二进制形式的JSON，允许前导空白和 UTF-8 BOM
+        text_start = payload[:64].lstrip(b"\xef\xbb\xbf \t\r\n")[:1]
+        if text_start in (b"{", b"["):
+            return json.loads(payload.decode('utf-8-sig'))
+        import msgpack  # 可选依赖，只在收到 MessagePack 时加载
+        return msgpack.unpackb(payload, raw=False)
+    return {"msgType": SYNC_MSG_TYPE, "msgExtra": {"msgType": "lotteryRecords", "msgExtra": records}}
+
+
+def enable_compression(factory):
+    """让客户端工厂协商 permessage-deflate 压缩"""
+    from autobahn.websocket.compress import (PerMessageDeflateOffer, PerMessageDeflateResponse,
+                                             PerMessageDeflateResponseAccept)
+
+    def accept(response):
+        if isinstance(response, PerMessageDeflateResponse):
+            return PerMessageDeflateResponseAccept(response)
+
+    factory.setProtocolOptions(perMessageCompressionOffers=[PerMessageDeflateOffer()],
+                               perMessageCompressionAccept=accept)
+
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def _skip_ws(text, pos):
+    return _WHITESPACE.match(text, pos).end()
+
+
+def _open_object(text, pos):
+    """pos 处应为 '{'，返回第一个成员（或 '}'）的位置"""
+    pos = _skip_ws(text, pos)
+    if text[pos:pos + 1] != '{':
+        raise ValueError(f"位置 {pos} 处不是JSON对象")
+    return _skip_ws(text, pos + 1)
+
+
+def _next_member(text, pos):
+    """读取一个成员的键，返回 (键, 值起始位置)；对象结束时返回 (None, 对象结束位置)"""
+    if text[pos:pos + 1] == '}':
+        return None, pos + 1
+    key, pos = _decoder.raw_decode(text, pos)
+    pos = _skip_ws(text, pos)
+    if not isinstance(key, str) or text[pos:pos + 1] != ':':
+        raise ValueError(f"位置 {pos} 处的JSON对象格式错误")
+    return key, _skip_ws(text, pos + 1)
+
+
+def _after_value(text, end):
+    """跳过值之后的逗号，返回下一个成员（或 '}'）的位置"""
+    pos = _skip_ws(text, end)
+    if text[pos:pos + 1] == ',':
+        return _skip_ws(text, pos + 1)
+    if text[pos:pos + 1] == '}':
+        return pos
+    raise ValueError(f"位置 {pos} 处的JSON对象格式错误")
+
+
+class SyncRecords:
+    """同步数据中的记录 {日期: {文件: [行, ...]}}，按 (日期, 文件) 取用"""
+
+    def __init__(self, records):
+        self._records = records
+
+    def dates(self):
+        return list(self._records)
+
+    def files(self, date):
+        return list(self._records.get(date, {}))
+
+    def lines(self, date, file_type):
+        return self._records[date][file_type]
+
+    def items(self):
+        """逐个产出 (日期, 文件, 行列表)"""
+        for date, files in self._records.items():
+            for file_type, lines in files.items():
+                yield date, file_type, lines
+
+
+class LazySyncRecords(SyncRecords):
+    """保留原始文本，每个文件的行在使用时才解码，用完即可释放
+
+    第一次完整遍历 items() 时逐个文件解码，并记下各文件在文本中的位置；之后 lines() 只解码
+    所需的文件。任意时刻只有正在使用的文件被解码，峰值内存约为原始文本加单个文件的大小。
+    """
+
+    def __init__(self, text, pos):
+        super().__init__(None)
+        self._text = text
+        self._pos = pos
+        self._index = None  # 日期 -> {文件: 行列表在文本中的位置}
+
+    def items(self):
+        text = self._text
+        index = {}
+        pos = _open_object(text, self._pos)
+        while True:
+            date, pos = _next_member(text, pos)
+            if date is None:
+                break
+            files = index[date] = {}
+            file_pos = _open_object(text, pos)
+            while True:
+                file_type, file_pos = _next_member(text, file_pos)
+                if file_type is None:
+                    break
+                files[file_type] = file_pos
+                lines, end = _decoder.raw_decode(text, file_pos)
+                yield date, file_type, lines
+                file_pos = _after_value(text, end)
+            pos = _after_value(text, file_pos)
+        self._index = index
+
+    def _ensure_index(self):
+        if self._index is None:
+            for _ in self.items():
+                pass
+        return self._index
+
+    def dates(self):
+        return list(self._ensure_index())
+
+    def files(self, date):
+        return list(self._ensure_index().get(date, {}))
+
+    def lines(self, date, file_type):
+        lines, _ = _decoder.raw_decode(self._text, self._ensure_index()[date][file_type])
+        return lines
+
+
+class LazyEnvelope:
+    """按需解码的消息信封
+
+    构造时只读取外层的 msgType 并记下 msgExtra 的位置；msgExtra 只有在被使用时才解码。
+    同步数据（msgType 1995）可先读取内层 msgType，不需要的同步数据不必解码其中的记录；
+    需要的同步数据由 records() 返回 LazySyncRecords，按 (日期, 文件) 逐个解码。
+    只在大帧上使用（见 LAZY_ENVELOPE_MIN_SIZE），小帧的额外开销大于收益。
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.msg_type = None
+        self._extra_pos = None
+        self._extra = None
+        self._extra_decoded = False
+        self._inner_type = None
+        self._inner_scanned = False
+        self._records_pos = None
+        self._records = None  # 内层 msgType 在记录之后时，扫描时已解码的记录
+
+        pos = _open_object(text, 0)
+        while True:
+            key, pos = _next_member(text, pos)
+            if key is None:
+                break
+            if key == "msgExtra" and self.msg_type is None:
+                # msgExtra 在 msgType 之前，只能先解码
+                self._extra, end = _decoder.raw_decode(text, pos)
+                self._extra_decoded = True
+            elif key == "msgExtra":
+                self._extra_pos = pos
+                break
+            else:
+                value, end = _decoder.raw_decode(text, pos)
+                if key == "msgType":
+                    self.msg_type = value
+                    if self._extra_decoded:
+                        break
+            pos = _after_value(text, end)
+
+    def msg_extra(self):
+        """完整解码 msgExtra"""
+        if not self._extra_decoded:
+            if self._extra_pos is not None:
+                self._extra, _ = _decoder.raw_decode(self.text, self._extra_pos)
+            self._extra_decoded = True
+        return self._extra if self._extra is not None else {}
+
+    def inner_type(self):
+        """同步数据的内层 msgType，不解码内层 msgExtra"""
+        if self._extra_decoded:
+            extra = self._extra
+            return extra.get("msgType") if isinstance(extra, dict) else None
+        if self._extra_pos is None or self.text[self._extra_pos:self._extra_pos + 1] != '{':
+            return None
+        if not self._inner_scanned:
+            self._inner_scanned = True
+            text = self.text
+            pos = _open_object(text, self._extra_pos)
+            while True:
+                key, pos = _next_member(text, pos)
+                if key is None:
+                    break
+                if key == "msgExtra":
+                    self._records_pos = pos
+                    if self._inner_type is not None:
+                        break
+                    # 内层 msgType 在记录之后，只能先解码记录，留给 records() 复用而不再解码一次
+                    self._records, end = _decoder.raw_decode(text, pos)
+                else:
+                    value, end = _decoder.raw_decode(text, pos)
+                    if key == "msgType":
+                        self._inner_type = value
+                        if self._records_pos is not None:
+                            break
+                pos = _after_value(text, end)
+        return self._inner_type
+
+    def records(self):
+        """同步数据中的记录（SyncRecords），通常按 (日期, 文件) 延迟解码"""
+        if self._extra_decoded:
+            extra = self._extra if isinstance(self._extra, dict) else {}
+            return SyncRecords(extra.get("msgExtra", {}))
+        self.inner_type()
+        if self._records is not None:
+            return SyncRecords(self._records)
+        if self._records_pos is None or self.text[self._records_pos:self._records_pos + 1] != '{':
+            return SyncRecords({})
+        return LazySyncRecords(self.text, self._records_pos)